@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from app.local_settings import LOCAL_DATABASES
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,7 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,6 +82,16 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Persistent connections: seconds a connection is kept between requests,
+# 0 to close it after every request or "none" to keep it forever
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '0')
+DB_CONN_MAX_AGE = (
+    None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+)
+# Check reused connections at the start of every request and reconnect
+# when they stopped working
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': LOCAL_DATABASES['default'].get('ENGINE'),
@@ -86,9 +100,58 @@ DATABASES = {
         'PASSWORD':LOCAL_DATABASES['default'].get('PASSWORD'),
         'HOST': LOCAL_DATABASES['default'].get('HOST'),
         'PORT':LOCAL_DATABASES['default'].get('PORT'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+    }
+}
+
+# Read replicas: comma separated hosts sharing the settings of the primary.
+# Safe requests read from them, unless the client wrote within the last
+# DB_REPLICA_PIN_SECONDS (pins are kept in the default cache, which must
+# be shared by every process)
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASE_REPLICAS.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = dict(
+        DATABASES['default'],
+        HOST=host,
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DB_REPLICA_PIN_CACHE = 'default'
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_API_CACHE = 'default'
+RECIPE_API_CACHE_TIMEOUT = int(os.environ.get('RECIPE_API_CACHE_TIMEOUT', 300))
+# Build list responses from values() rows instead of the serializers
+RECIPE_VALUES_LIST = os.environ.get('RECIPE_VALUES_LIST', '1') == '1'
+
+# Responses are compressed with brotli, when installed, or gzip. The
+# compressed bodies of cached responses are cached alongside them.
+# COMPRESSION_CONTENT_TYPES may replace the compressed media types,
+# core.middleware.COMPRESSIBLE_TYPES by default
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))
+COMPRESSION_CACHE = RECIPE_API_CACHE
+COMPRESSION_CACHE_TIMEOUT = RECIPE_API_CACHE_TIMEOUT
+
+TOKEN_AUTH_CACHE = 'default'
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+TOKEN_AUTH_LOCAL_TTL = int(os.environ.get('TOKEN_AUTH_LOCAL_TTL', 5))
+TOKEN_AUTH_LOCAL_SIZE = 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -130,9 +193,73 @@ STATIC_URL = '/static/'
 
 AUTH_USER_MODEL= 'core.User'
 
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+# JSON is encoded and decoded with orjson when it is installed, and
+# application/msgpack is offered when msgpack is installed
+API_MSGPACK = find_spec('msgpack') is not None
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 100)),
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['core.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['core.parsers.MessagePackParser'] if API_MSGPACK else []),
+}
+
 
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Let the web server send media files: '', 'x-sendfile' (Apache, lighttpd)
+# or 'x-accel-redirect' (nginx, serving MEDIA_ROOT as an internal location)
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX',
+    '/protected/',
+)
+
+# Every request is logged as a JSON line on the core.performance logger
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'performance': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Request duration histograms by endpoint, dumped every interval (seconds)
+# to PERFORMANCE_HISTOGRAM_FILE.<pid> when the file is set
+PERFORMANCE_HISTOGRAM_FILE = os.environ.get('PERFORMANCE_HISTOGRAM_FILE', '')
+PERFORMANCE_HISTOGRAM_INTERVAL = int(
+    os.environ.get('PERFORMANCE_HISTOGRAM_INTERVAL', 60),
+)
+
+# Recipe images are resized by a pool of background threads
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024),
+)
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
@@ -16,9 +16,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from recipe.media import MediaView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path(
@@ -28,5 +29,10 @@ urlpatterns = [
     path(
         'api/recipe/',
         include('recipe.urls'),
-    )
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    ),
+    path(
+        f'{settings.MEDIA_URL.lstrip("/")}<path:path>',
+        MediaView.as_view(),
+        name='media',
+    ),
+]
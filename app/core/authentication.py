@@ -0,0 +1,120 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+TOKEN_KEY = 'auth-token:{key}'
+
+
+class LocalLRUCache:
+    """ Small thread safe in-process LRU cache with a time to live"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LocalLRUCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_LOCAL_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_AUTH_LOCAL_TTL', 5),
+)
+
+
+def get_token_cache():
+    """ Return the shared cache holding authenticated tokens"""
+    return caches[getattr(settings, 'TOKEN_AUTH_CACHE', 'default')]
+
+
+def invalidate_tokens(*keys):
+    """ Forget the cached tokens so the next request reads the database"""
+    for key in keys:
+        local_tokens.delete(key)
+    get_token_cache().delete_many([TOKEN_KEY.format(key=key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ Token authentication that caches the token and its user.
+
+    Lookups go through an in-process LRU, then the shared cache and only
+    then the authtoken table. Deleting a token or saving its user drops
+    the shared entry and the local entry of the current process; other
+    processes notice within TOKEN_AUTH_LOCAL_TTL seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        token = local_tokens.get(key)
+        if token is None:
+            token = self._get_shared_token(key)
+            local_tokens.set(key, token)
+        # Requests may modify their user, never share the cached instance
+        token = copy.deepcopy(token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return (token.user, token)
+
+    def _get_shared_token(self, key):
+        """ Return the token from the shared cache or the database"""
+        cache = get_token_cache()
+        cache_key = TOKEN_KEY.format(key=key)
+        token = cache.get(cache_key)
+        if token is None:
+            model = self.get_model()
+            # Tokens are used as soon as they are created, before the
+            # replicas may hold them, so they are read from the primary
+            tokens = model.objects.using(DEFAULT_DB_ALIAS)
+            try:
+                token = tokens.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cache.set(
+                cache_key,
+                token,
+                getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300),
+            )
+
+        return token
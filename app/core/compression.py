@@ -0,0 +1,83 @@
+from django.utils.text import compress_sequence
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# Brotli quality fit for compressing responses on the fly
+BROTLI_QUALITY = 5
+
+
+def brotli_compress(content):
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+def brotli_compress_sequence(sequence):
+    """ Compress an iterator of bytes, flushing after every chunk"""
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+# Content codings by preference, with their whole body and streaming
+# compressors
+ENCODINGS = {
+    'br': (brotli_compress, brotli_compress_sequence),
+    'gzip': (compress_string, compress_sequence),
+}
+
+
+def available_encodings():
+    """ Return the content codings this server can produce"""
+    if brotli is None:
+        return ['gzip']
+
+    return list(ENCODINGS)
+
+
+def parse_accept_encoding(header):
+    """ Return the quality of every coding of an Accept-Encoding header"""
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities
+
+
+def negotiate_encoding(header):
+    """ Return the preferred content coding accepted by the client, None
+    when the body must not be compressed"""
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in available_encodings():
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def compress(encoding, content):
+    return ENCODINGS[encoding][0](content)
+
+
+def compress_stream(encoding, sequence):
+    return ENCODINGS[encoding][1](sequence)
@@ -0,0 +1,53 @@
+import threading
+from collections import Counter
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+
+class ConnectionMetrics:
+    """ Thread safe counters of database connections opened, reused by a
+    new request and dropped as unusable, per alias"""
+
+    def __init__(self):
+        self._counts = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def increment(self, alias, event):
+        with self._lock:
+            self._counts[alias][event] += 1
+
+    def snapshot(self):
+        """ Return the counters of every alias"""
+        with self._lock:
+            return {
+                alias: {
+                    'opened': counts['opened'],
+                    'reused': counts['reused'],
+                    'unusable': counts['unusable'],
+                }
+                for alias, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+connection_metrics = ConnectionMetrics()
+
+
+def check_connections():
+    """ Count the persistent connections a new request reuses and close
+    the ones that stopped working (e.g. after a database restart), so the
+    request opens a fresh connection instead of failing"""
+    health_checks = getattr(settings, 'DB_CONN_HEALTH_CHECKS', True)
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if health_checks and not connection.is_usable():
+            connection.close()
+            connection_metrics.increment(connection.alias, 'unusable')
+        else:
+            connection_metrics.increment(connection.alias, 'reused')
@@ -0,0 +1,254 @@
+import io
+import json
+import math
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import invalidate_tokens
+from core.models import Recipe
+
+from recipe.cache import bump_data_version
+
+
+SCENARIOS = ('list', 'detail', 'filter', 'search', 'create', 'upload')
+
+
+class Rollback(Exception):
+    """ Raised to undo every write of the benchmark"""
+
+
+def percentile(values, percent):
+    """ Return the nearest-rank percentile of the values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+
+    return ordered[rank - 1]
+
+
+def summarize(durations, query_counts):
+    """ Return the latency percentiles, in milliseconds, and the query
+    counts of a scenario"""
+    durations = [duration * 1000 for duration in durations]
+
+    return {
+        'requests': len(durations),
+        'latency_ms': {
+            'min': round(min(durations), 3),
+            'p50': round(percentile(durations, 50), 3),
+            'p90': round(percentile(durations, 90), 3),
+            'p99': round(percentile(durations, 99), 3),
+            'max': round(max(durations), 3),
+            'mean': round(statistics.mean(durations), 3),
+        },
+        'queries': {
+            'min': min(query_counts),
+            'median': statistics.median(query_counts),
+            'max': max(query_counts),
+        },
+    }
+
+
+def jpeg_image():
+    """ Return a small JPEG file to upload"""
+    image = io.BytesIO()
+    Image.new('RGB', (64, 64), color='orange').save(image, format='JPEG')
+    image.name = 'benchmark.jpg'
+    image.seek(0)
+
+    return image
+
+
+class Command(BaseCommand):
+    """ Django command to measure the recipe API through the test client.
+
+    Every write is rolled back and uploads go to a temporary media root,
+    so runs can be repeated and compared on the same data.
+    """
+    help = 'Benchmark the recipe API and print the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User to benchmark as, the user with most recipes by '
+                 'default',
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            choices=SCENARIOS,
+            help='Scenario to run, every scenario by default',
+        )
+        parser.add_argument(
+            '--cached',
+            action='store_true',
+            help='Let GET requests hit the response cache',
+        )
+        parser.add_argument('--output', help='Write the JSON to this file')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.options = options
+        self.token_keys = []
+        self.user = self._get_user(options['email'])
+        self.recipe_ids = list(Recipe.objects.filter(
+            user=self.user,
+        ).order_by('id').values_list('id', flat=True))
+        if not self.recipe_ids:
+            raise CommandError(f'{self.user.email} has no recipe')
+
+        results = {
+            'user': self.user.email,
+            'recipes': len(self.recipe_ids),
+            'iterations': options['iterations'],
+            'cached': options['cached'],
+            'scenarios': {},
+        }
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+            ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver'],
+        ):
+            try:
+                with transaction.atomic():
+                    self.client = self._get_client()
+                    for scenario in options['scenarios'] or SCENARIOS:
+                        results['scenarios'][scenario] = self._run(scenario)
+                    raise Rollback()
+            except Rollback:
+                pass
+            finally:
+                # Forget what was cached about the rolled back writes
+                invalidate_tokens(*self.token_keys)
+                bump_data_version(self.user.pk)
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as destination:
+                destination.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def _get_user(self, email):
+        """ Return the user to benchmark as"""
+        users = get_user_model().objects.all()
+        if email:
+            users = users.filter(email=email)
+        else:
+            users = users.annotate(
+                recipe_count=Count('recipe'),
+            ).order_by('-recipe_count', 'id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to benchmark, run seed_data first')
+
+        return user
+
+    def _get_client(self):
+        """ Return a client authenticated with a token of the user"""
+        token, created = Token.objects.get_or_create(user=self.user)
+        if created:
+            self.token_keys.append(token.key)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        return client
+
+    def _requests(self, scenario):
+        """ Return a function sending one request of the scenario"""
+        recipe_ids = self.recipe_ids
+        list_url = reverse('recipe:recipe-list')
+        tag_ids = list(self.user.tag_set.values_list('id', flat=True))
+        titles = list(Recipe.objects.filter(
+            id__in=recipe_ids[:50],
+        ).values_list('title', flat=True))
+
+        def detail():
+            recipe_id = self.random.choice(recipe_ids)
+            return self.client.get(
+                reverse('recipe:recipe-detail', args=[recipe_id]),
+            )
+
+        def filter_recipes():
+            tags = self.random.sample(tag_ids, min(2, len(tag_ids)))
+            return self.client.get(list_url, {
+                'tags': ','.join(str(tag) for tag in tags),
+                'max_price': '50',
+                'ordering': '-price',
+            })
+
+        def search():
+            return self.client.get(list_url, {
+                'search': self.random.choice(titles).split()[0],
+            })
+
+        def create():
+            return self.client.post(list_url, {
+                'title': 'Benchmark recipe',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': tag_ids[:2],
+                'ingredients': [],
+            }, format='json')
+
+        def upload():
+            recipe_id = self.random.choice(recipe_ids)
+            return self.client.post(
+                reverse('recipe:recipe-upload-image', args=[recipe_id]),
+                {'image': jpeg_image()},
+                format='multipart',
+            )
+
+        return {
+            'list': lambda: self.client.get(list_url),
+            'detail': detail,
+            'filter': filter_recipes,
+            'search': search,
+            'create': create,
+            'upload': upload,
+        }[scenario]
+
+    def _run(self, scenario):
+        """ Send the requests of a scenario and summarize them"""
+        send = self._requests(scenario)
+        durations, query_counts = [], []
+        total = self.options['warmup'] + self.options['iterations']
+        for iteration in range(total):
+            if not self.options['cached']:
+                bump_data_version(self.user.pk)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = send()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                duration = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{scenario} answered {response.status_code}: '
+                    f'{response.content[:200]}'
+                )
+            if iteration >= self.options['warmup']:
+                durations.append(duration)
+                query_counts.append(len(queries))
+
+        return summarize(durations, query_counts)
@@ -0,0 +1,153 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.management.commands.benchmark import Rollback
+from core.management.commands.benchmark import percentile
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+from recipe.cache import bump_data_version
+from recipe.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    """ Django command comparing the recipe list built by the serializers
+    with the one built from values() rows, on a large generated page.
+
+    Every iteration walks the whole list, page by page. The generated
+    data is rolled back.
+    """
+    help = 'Benchmark the values() list representation against DRF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument(
+            '--expand',
+            action='store_true',
+            help='Nest the tags and ingredients of the recipes',
+        )
+
+    def handle(self, *args, **options):
+        self.user = None
+        rows = options['rows']
+        params = {'page_size': min(rows, KeysetPagination.max_page_size)}
+        if options['expand']:
+            params['expand'] = 'tags,ingredients'
+
+        results = {'rows': rows, 'expand': options['expand']}
+        try:
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver'],
+            ):
+                self.user = self._create_data(rows, options)
+                client = APIClient()
+                client.force_authenticate(self.user)
+                contents = {}
+                for name, enabled in (('serializer', False),
+                                      ('values', True)):
+                    with override_settings(RECIPE_VALUES_LIST=enabled):
+                        durations, contents[name] = self._time(
+                            client,
+                            params,
+                            options['iterations'],
+                        )
+                    results[name] = {
+                        'min_ms': round(min(durations) * 1000, 3),
+                        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+                    }
+                if contents['serializer'] != contents['values']:
+                    raise CommandError('The two representations differ')
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            # The id of the rolled back user may be given again
+            if self.user is not None:
+                bump_data_version(self.user.pk)
+
+        results['speedup'] = round(
+            results['serializer']['p50_ms'] / results['values']['p50_ms'],
+            2,
+        )
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+    def _create_data(self, rows, options):
+        """ Create a user with rows recipes, tags and ingredients"""
+        user = get_user_model().objects.create_user(
+            f'benchmark-list-{time.time()}@example.com',
+            'benchmark',
+        )
+        tags = [
+            Tag.objects.create(user=user, name=f'Tag {i}') for i in range(20)
+        ]
+        ingredient = Ingredient.objects.create(user=user, name='Salt')
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=i % 120 + 1,
+                price=f'{i % 10000 / 100:.2f}',
+                link=f'https://example.com/{i}',
+            )
+            for i in range(rows)
+        ])
+        recipe_ids = list(Recipe.objects.filter(
+            user=user,
+        ).values_list('id', flat=True))
+        per_recipe = options['tags_per_recipe']
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(
+                recipe_id=recipe_id,
+                tag_id=tags[(index + offset) % len(tags)].id,
+            )
+            for index, recipe_id in enumerate(recipe_ids)
+            for offset in range(per_recipe)
+        ])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient.id,
+            )
+            for recipe_id in recipe_ids
+        ])
+
+        return user
+
+    def _walk(self, client, params):
+        """ Return the bodies of every page of the list"""
+        contents = []
+        response = client.get(reverse('recipe:recipe-list'), params)
+        while True:
+            if response.status_code != 200:
+                raise CommandError(
+                    f'The list answered {response.status_code}',
+                )
+            contents.append(response.content)
+            if not response.data['next']:
+                return contents
+            response = client.get(response.data['next'])
+
+    def _time(self, client, params, iterations):
+        """ Return the durations of uncached walks of the list and the
+        pages of the last one"""
+        durations = []
+        for _ in range(iterations):
+            bump_data_version(self.user.pk)
+            start = time.perf_counter()
+            contents = self._walk(client, params)
+            durations.append(time.perf_counter() - start)
+
+        return durations, contents
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """ Django command processing the recipe images still pending.
+
+    Images are processed by an in-process thread pool, so a job is lost
+    when its process stops before it completes. Run this command at
+    startup, or regularly, to build the variants of those images.
+    """
+    help = 'Build the variants of the recipe images left pending'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=float,
+            default=300,
+            help='Skip images uploaded within these seconds, which may '
+                 'still be processed, 300 by default',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        pending = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING,
+            updated_at__lte=cutoff,
+        ).exclude(image='').values_list('id', 'image')
+
+        count = 0
+        for recipe_id, image_name in pending.iterator():
+            process_recipe_image(recipe_id, image_name)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {count} pending images'
+        ))
@@ -0,0 +1,155 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+
+WORDS = (
+    'apple', 'basil', 'bean', 'beef', 'bread', 'butter', 'carrot',
+    'cheese', 'chicken', 'chili', 'corn', 'cream', 'curry', 'egg', 'fish',
+    'garlic', 'ginger', 'honey', 'lemon', 'lentil', 'mint', 'mushroom',
+    'noodle', 'olive', 'onion', 'pasta', 'pepper', 'pork', 'potato',
+    'rice', 'salmon', 'spinach', 'tofu', 'tomato', 'vanilla', 'yogurt',
+)
+
+
+class Command(BaseCommand):
+    """ Django command to bulk generate users with tags, ingredients and
+    recipes for benchmarks"""
+    help = 'Generate synthetic users, tags, ingredients and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=50,
+                            help='Ingredients per user')
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Recipes per user')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--email-prefix', default='seed',
+                            help='Users are named <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='seedpass')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, for repeatable data')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        emails = [
+            f'{options["email_prefix"]}-{index}@example.com'
+            for index in range(options['users'])
+        ]
+        user_model = get_user_model()
+        if user_model.objects.filter(email__in=emails).exists():
+            raise CommandError(
+                f'Users {options["email_prefix"]}-N@example.com already '
+                f'exist, pick another --email-prefix'
+            )
+
+        with transaction.atomic():
+            password = make_password(options['password'])
+            user_model.objects.bulk_create(
+                [user_model(email=email, password=password)
+                 for email in emails],
+                batch_size=self.batch_size,
+            )
+            user_ids = list(user_model.objects.filter(
+                email__in=emails,
+            ).order_by('id').values_list('id', flat=True))
+            tags = self._create_named(Tag, user_ids, options['tags'])
+            ingredients = self._create_named(
+                Ingredient,
+                user_ids,
+                options['ingredients'],
+            )
+            recipes = self._create_recipes(user_ids, options['recipes'])
+            self._link(
+                Recipe.tags.through,
+                'tag_id',
+                recipes,
+                tags,
+                options['tags_per_recipe'],
+            )
+            self._link(
+                Recipe.ingredients.through,
+                'ingredient_id',
+                recipes,
+                ingredients,
+                options['ingredients_per_recipe'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(user_ids)} users, '
+            f'{len(user_ids) * options["tags"]} tags, '
+            f'{len(user_ids) * options["ingredients"]} ingredients and '
+            f'{len(user_ids) * options["recipes"]} recipes'
+        ))
+
+    def _name(self, index):
+        """ Return a readable name made of two words and a number"""
+        first, second = self.random.sample(WORDS, 2)
+
+        return f'{first} {second} {index}'
+
+    def _ids_by_user(self, model, user_ids):
+        """ Return the ids of the rows of every user"""
+        ids = {user_id: [] for user_id in user_ids}
+        rows = model.objects.filter(
+            user_id__in=user_ids,
+        ).order_by('id').values_list('user_id', 'id')
+        for user_id, pk in rows:
+            ids[user_id].append(pk)
+
+        return ids
+
+    def _create_named(self, model, user_ids, count):
+        """ Create the tags or ingredients of every user"""
+        model.objects.bulk_create(
+            [model(user_id=user_id, name=self._name(index))
+             for user_id in user_ids for index in range(count)],
+            batch_size=self.batch_size,
+        )
+
+        return self._ids_by_user(model, user_ids)
+
+    def _create_recipes(self, user_ids, count):
+        """ Create the recipes of every user"""
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user_id=user_id,
+                    title=self._name(index),
+                    time_minutes=self.random.randint(5, 240),
+                    price=Decimal(self.random.randint(100, 9999)) / 100,
+                    link=f'https://example.com/recipes/{user_id}/{index}',
+                )
+                for user_id in user_ids for index in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+
+        return self._ids_by_user(Recipe, user_ids)
+
+    def _link(self, through, column, recipes, related, per_recipe):
+        """ Link every recipe to random tags or ingredients of its user"""
+        rows = []
+        for user_id, recipe_ids in recipes.items():
+            choices = related[user_id]
+            for recipe_id in recipe_ids:
+                for pk in self.random.sample(
+                    choices,
+                    min(per_recipe, len(choices)),
+                ):
+                    rows.append(through(recipe_id=recipe_id, **{column: pk}))
+        through.objects.bulk_create(rows, batch_size=self.batch_size)
@@ -1,3 +1,5 @@
+import random
+import sys
 import time
 
 from django.db import connections
@@ -7,16 +9,82 @@ from django.core.management.base import BaseCommand
 
 class Command(BaseCommand):
     """ Django command to pause execution until database is available"""
+    help = 'Wait until every database accepts queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to check, every alias by default',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait for all the databases, 60 by default',
+        )
+        parser.add_argument(
+            '--initial-delay',
+            type=float,
+            default=0.1,
+            help='Longest first wait between attempts, in seconds',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Longest wait between attempts, in seconds',
+        )
+        parser.add_argument(
+            '--exit-code',
+            type=int,
+            default=1,
+            help='Exit status when the timeout expires, 1 by default',
+        )
+
+    def check_database(self, alias):
+        """ Connect to the database and run a trivial query"""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        except OperationalError:
+            connection.close()
+            raise
+
+    def wait_for(self, alias, deadline, options):
+        """ Retry the database with exponential backoff and full jitter
+        until it answers or the deadline passes"""
+        delay = options['initial_delay']
+        while True:
+            try:
+                self.check_database(alias)
+                return True
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stderr.write(f'Database {alias} unavailable: {error}')
+                    return False
+                wait = min(random.uniform(0, delay), remaining)
+                self.stdout.write(
+                    f'Database {alias} unavailable, '
+                    f'waiting {wait:.2f} seconds...'
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, options['max_delay'])
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
+        deadline = time.monotonic() + options['timeout']
 
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(0.2)
+        for alias in options['databases'] or list(connections):
+            if not self.wait_for(alias, deadline, options):
+                self.stderr.write(self.style.ERROR(
+                    f'Databases not available after {options["timeout"]} '
+                    f'seconds'
+                ))
+                sys.exit(options['exit_code'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
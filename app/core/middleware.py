@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from core.compression import compress
+from core.compression import compress_stream
+from core.compression import negotiate_encoding
+from core.performance import RequestTimings
+from core.performance import endpoint_histograms
+from core.performance import endpoint_name
+from core.routers import start_replica_reads
+from core.routers import stop_replica_reads
+
+
+logger = logging.getLogger('core.performance')
+
+PIN_KEY = 'db-pin:{client}'
+COMPRESSED_KEY = 'compressed:{key}:{encoding}:{digest}'
+# HTML is left out: pages holding a CSRF token next to reflected input
+# would expose the token to BREACH
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/msgpack',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def get_pin_cache():
+    """ Return the cache holding the clients pinned to the primary"""
+    return caches[getattr(settings, 'DB_REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_key(request):
+    """ Return the pin cache key of the client sending the request, from
+    its token or its session, None for anonymous clients"""
+    credentials = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+
+    client = hashlib.sha256(credentials.encode()).hexdigest()
+
+    return PIN_KEY.format(client=client)
+
+
+class ReplicaPinningMiddleware:
+    """ Read from the replicas during safe requests, except for clients
+    that wrote within the last DB_REPLICA_PIN_SECONDS so they read their
+    own writes from the primary.
+
+    Pins are kept in a cache, which must be shared by every process.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = pin_key(request)
+        pinned = key is not None and get_pin_cache().get(key) is not None
+        start_replica_reads(request.method in SAFE_METHODS and not pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = stop_replica_reads()
+
+        if wrote and key is not None:
+            get_pin_cache().set(
+                key,
+                True,
+                getattr(settings, 'DB_REPLICA_PIN_SECONDS', 5),
+            )
+
+        return response
+
+
+class PerformanceMiddleware:
+    """ Measure the wall time, SQL queries, database time, serialization
+    and rendering time of every request.
+
+    Serialization is measured by the serializers and views building the
+    representation, see core.serializers.TimedRepresentationMixin.
+
+    The timings are sent in a Server-Timing header and logged as a JSON
+    line on the core.performance logger. Setting
+    PERFORMANCE_HISTOGRAM_FILE also keeps duration histograms by endpoint,
+    dumped to that file every PERFORMANCE_HISTOGRAM_INTERVAL seconds.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.timings = timings
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.queries),
+                )
+            response = self.get_response(request)
+        timings.stop()
+
+        response['Server-Timing'] = timings.server_timing()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dict(
+                method=request.method,
+                path=request.path,
+                endpoint=endpoint_name(request),
+                status=response.status_code,
+                **timings.as_dict()
+            )))
+        if getattr(settings, 'PERFORMANCE_HISTOGRAM_FILE', ''):
+            endpoint_histograms.record(
+                endpoint_name(request),
+                timings.total * 1000,
+            )
+            endpoint_histograms.dump_if_due()
+
+        return response
+
+    def process_template_response(self, request, response):
+        request.timings.start_render(response)
+
+        return response
+
+
+class CompressionMiddleware:
+    """ Compress responses with brotli, when it is installed, or gzip.
+
+    Bodies shorter than COMPRESSION_MIN_SIZE, media types missing from
+    COMPRESSION_CONTENT_TYPES (COMPRESSIBLE_TYPES by default), partial and
+    already encoded responses and responses using the CSRF token are sent
+    as they are. Streaming responses are compressed chunk by chunk.
+
+    Responses with a compressed_cache_key attribute, set by the response
+    cache, keep their compressed body in the COMPRESSION_CACHE so a cached
+    body is compressed once instead of on every hit.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                encoding,
+                response.streaming_content,
+            )
+            del response['Content-Length']
+        else:
+            content = self._compressed_content(response, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    def _compressible(self, request, response):
+        """ Tell whether the response is worth, and safe, compressing"""
+        if request.META.get('CSRF_COOKIE_USED'):
+            return False
+        if response.has_header('Content-Encoding') or \
+                response.has_header('Content-Range') or \
+                response.status_code == 206:
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+
+        content_type = response.get('Content-Type', '').split(';')[0]
+        content_types = getattr(
+            settings,
+            'COMPRESSION_CONTENT_TYPES',
+            COMPRESSIBLE_TYPES,
+        )
+        if content_type.strip().lower() not in content_types:
+            return False
+
+        return response.streaming or len(response.content) >= getattr(
+            settings,
+            'COMPRESSION_MIN_SIZE',
+            500,
+        )
+
+    def _compressed_content(self, response, encoding):
+        """ Return the compressed body, from the cache when the response
+        allows it"""
+        key = getattr(response, 'compressed_cache_key', None)
+        if key is None:
+            return compress(encoding, response.content)
+
+        cache = caches[getattr(settings, 'COMPRESSION_CACHE', 'default')]
+        key = COMPRESSED_KEY.format(
+            key=key,
+            encoding=encoding,
+            digest=hashlib.md5(response.content).hexdigest(),
+        )
+        content = cache.get(key)
+        if content is None:
+            content = compress(encoding, response.content)
+            cache.set(
+                key,
+                content,
+                getattr(settings, 'COMPRESSION_CACHE_TIMEOUT', 300),
+            )
+
+        return content
@@ -0,0 +1,49 @@
+# Text search indexes used by the recipe search on PostgreSQL.
+
+from django.db import migrations
+
+
+SEARCH_INDEXES = (
+    ('core_recipe', 'title'),
+    ('core_tag', 'name'),
+    ('core_ingredient', 'name'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """ Create tsvector and trigram GIN indexes on searched columns"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_tsv ON {table} '
+            f"USING gin (to_tsvector('simple'::regconfig, "
+            f"COALESCE({column}, '')))"
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} '
+            f'USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    """ Drop the text search indexes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_tsv')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -70,6 +70,9 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
 
     def __str__(self):
         return self.name
@@ -82,6 +85,24 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class ImageBlob(models.Model):
+    """Content addressed image file shared by the recipes using it"""
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+    )
+    size = models.PositiveIntegerField()
+    references = models.PositiveIntegerField(
+        default=0,
+    )
 
     def __str__(self):
         return self.name
@@ -109,10 +130,39 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
     )
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     image = models.ImageField(
         null=True,
         upload_to=recipe_image_file_path,
     )
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
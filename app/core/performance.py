@@ -0,0 +1,164 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+from django.conf import settings
+
+
+# Upper bounds, in milliseconds, of the request duration histogram buckets
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class QueryTimer:
+    """ Database execute wrapper counting the queries of a request and
+    the time spent running them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestTimings:
+    """ Timings of one request, in seconds"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = QueryTimer()
+        self.serialize = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self._measuring = set()
+
+    @contextmanager
+    def measure(self, name):
+        """ Add the duration of the block to the timing called name,
+        ignoring blocks nested in one already measuring it"""
+        if name in self._measuring:
+            yield
+            return
+
+        self._measuring.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            setattr(self, name, getattr(self, name) + duration)
+            self._measuring.discard(name)
+
+    def start_render(self, response):
+        """ Time the rendering of a template (or DRF) response"""
+        render_start = time.perf_counter()
+
+        def stop_render(rendered):
+            self.render += time.perf_counter() - render_start
+
+        response.add_post_render_callback(stop_render)
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+
+    def as_dict(self):
+        """ Return the timings in milliseconds and the query count"""
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'db_ms': round(self.queries.duration * 1000, 2),
+            'queries': self.queries.count,
+            'serialize_ms': round(self.serialize * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+        }
+
+    def server_timing(self):
+        """ Return the value of the Server-Timing header"""
+        return ', '.join((
+            f'db;dur={self.queries.duration * 1000:.2f};'
+            f'desc="{self.queries.count} queries"',
+            f'serialize;dur={self.serialize * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ))
+
+
+def measure(request, name):
+    """ Return a context manager adding the duration of its block to the
+    timing called name of the request, doing nothing when the request is
+    not instrumented"""
+    timings = getattr(request, 'timings', None)
+    if timings is None:
+        return nullcontext()
+
+    return timings.measure(name)
+
+
+class EndpointHistograms:
+    """ Thread safe request duration histograms by endpoint, regularly
+    written to a JSON file per process"""
+
+    def __init__(self):
+        self._counts = defaultdict(lambda: [0] * (len(HISTOGRAM_BUCKETS) + 1))
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+        self._atexit = False
+
+    def record(self, endpoint, duration_ms):
+        bucket = bisect.bisect_left(HISTOGRAM_BUCKETS, duration_ms)
+        with self._lock:
+            self._counts[endpoint][bucket] += 1
+            if not self._atexit:
+                atexit.register(self.dump)
+                self._atexit = True
+
+    def snapshot(self):
+        """ Return the bucket counts of every endpoint, by upper bound"""
+        bounds = [str(bound) for bound in HISTOGRAM_BUCKETS] + ['+Inf']
+        with self._lock:
+            return {
+                endpoint: dict(zip(bounds, counts))
+                for endpoint, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def dump(self):
+        """ Write the histograms to PERFORMANCE_HISTOGRAM_FILE.<pid>"""
+        path = getattr(settings, 'PERFORMANCE_HISTOGRAM_FILE', '')
+        if not path:
+            return
+        self._last_dump = time.monotonic()
+        filename = f'{path}.{os.getpid()}'
+        with open(f'{filename}.tmp', 'w') as output:
+            json.dump(self.snapshot(), output, indent=2, sort_keys=True)
+        os.replace(f'{filename}.tmp', filename)
+
+    def dump_if_due(self):
+        """ Dump the histograms every PERFORMANCE_HISTOGRAM_INTERVAL"""
+        interval = getattr(settings, 'PERFORMANCE_HISTOGRAM_INTERVAL', 60)
+        if time.monotonic() - self._last_dump >= interval:
+            self.dump()
+
+
+endpoint_histograms = EndpointHistograms()
+
+
+def endpoint_name(request):
+    """ Return a low cardinality name of the endpoint of the request"""
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match is not None else 'unresolved'
+
+    return f'{request.method} {view_name}'
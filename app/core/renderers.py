@@ -0,0 +1,76 @@
+from rest_framework.renderers import BaseRenderer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ JSON renderer encoding with orjson when it is installed, with the
+    same output as the DRF renderer.
+
+    Indented, ASCII only or non compact output, and data orjson cannot
+    encode, are rendered by the DRF renderer.
+    """
+
+    def _can_accelerate(self, accepted_media_type, renderer_context):
+        return orjson is not None and self.compact and \
+            not self.ensure_ascii and \
+            self.get_indent(accepted_media_type, renderer_context) is None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        if not self._can_accelerate(accepted_media_type,
+                                    renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS |
+                    orjson.OPT_PASSTHROUGH_DATETIME
+                ),
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict javascript subset, like the DRF renderer
+        return ret.replace(
+            '\u2028'.encode(),
+            b'\\u2028',
+        ).replace(
+            '\u2029'.encode(),
+            b'\\u2029',
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """ Renderer encoding to MessagePack, for internal service clients.
+
+    Needs the msgpack package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        return msgpack.packb(
+            data,
+            default=encoders.JSONEncoder().default,
+            use_bin_type=True,
+        )
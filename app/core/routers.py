@@ -0,0 +1,54 @@
+import random
+import threading
+
+from django.conf import settings
+
+
+_state = threading.local()
+
+
+def get_replicas():
+    """ Return the aliases of the read replicas"""
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def start_replica_reads(enabled):
+    """ Let (or stop) the reads of the current thread use the replicas"""
+    _state.replica_reads = enabled
+    _state.wrote = False
+
+
+def stop_replica_reads():
+    """ Send the reads back to the primary, returning whether the thread
+    wrote to the database meanwhile"""
+    wrote = getattr(_state, 'wrote', False)
+    start_replica_reads(False)
+
+    return wrote
+
+
+class ReplicaRouter:
+    """ Send writes to the primary and reads to a random replica when
+    enabled for the current thread, by ReplicaPinningMiddleware for safe
+    requests. Any other code (commands, background workers) reads the
+    primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or not getattr(_state, 'replica_reads', False):
+            return 'default'
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """ Replicas hold the same rows as the primary"""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """ Replicas are migrated through the replication of the primary"""
+        return db not in get_replicas()
@@ -0,0 +1,13 @@
+from core.performance import measure
+
+
+class TimedRepresentationMixin:
+    """ Serializer mixin adding the time spent building representations
+    to the serialize timing of the request.
+
+    Nested serializers are counted once, as part of their parent.
+    """
+
+    def to_representation(self, instance):
+        with measure(self.context.get('request'), 'serialize'):
+            return super().to_representation(instance)
@@ -0,0 +1,86 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_tokens
+from core.db import check_connections
+from core.db import connection_metrics
+from core.models import User
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+
+def touch_recipes(queryset):
+    """ Mark the recipes of the queryset as modified"""
+    queryset.update(updated_at=timezone.now())
+
+
+def recipes_using(obj):
+    """ Return the recipes linked to a tag or an ingredient"""
+    name = obj._meta.model_name
+    through = getattr(Recipe, f'{name}s').through
+    rows = through.objects.filter(**{name: obj})
+
+    return Recipe.objects.filter(pk__in=rows.values('recipe_id'))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_on_m2m_change(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """ Update the timestamp of recipes whose tags or ingredients change"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        instance.updated_at = timezone.now()
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        touch_recipes(recipes_using(instance))
+    else:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipe_on_related_delete(sender, instance, **kwargs):
+    """ Update the timestamp of recipes losing a tag or an ingredient"""
+    touch_recipes(recipes_using(instance))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """ Stop accepting a deleted token from the authentication cache"""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """ Reload the user of cached tokens after deactivation, password
+    changes or any other update"""
+    if created:
+        return
+
+    invalidate_tokens(*Token.objects.filter(
+        user=instance,
+    ).values_list('key', flat=True))
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    """ Count the database connections opened by this process"""
+    connection_metrics.increment(connection.alias, 'opened')
+
+
+@receiver(request_started)
+def check_reused_connections(sender, **kwargs):
+    """ Health check the persistent connections a request reuses"""
+    check_connections()
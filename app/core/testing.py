@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """ TestCase mixin asserting that endpoints stay within a query budget
+    whatever the number of rows they serve"""
+
+    # Row counts every budget must hold at, to prove it is constant
+    query_budget_sizes = (1, 100)
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS, msg=''):
+        """ Fail, listing the captured SQL, when the block runs more than
+        budget queries"""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        if len(context) > budget:
+            queries = '\n'.join(
+                f'{index}. {query["sql"]}'
+                for index, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f'{msg}{len(context)} queries run, over the budget of '
+                f'{budget}:\n{queries}'
+            )
+
+    def assertQueryBudgetAtSizes(self, budget, create_rows, send,
+                                 using=DEFAULT_DB_ALIAS):
+        """ Grow the data to every query_budget_sizes row count and check
+        that send() stays within budget each time.
+
+        create_rows(count) must add count rows, send() sends the request
+        and returns its response. Returns the responses, by size.
+        """
+        responses = {}
+        rows = 0
+        for size in self.query_budget_sizes:
+            create_rows(size - rows)
+            rows = size
+            with self.assertQueryBudget(budget, using, f'With {size} rows, '):
+                responses[size] = send()
+            self.assertLess(responses[size].status_code, 400)
+
+        return responses
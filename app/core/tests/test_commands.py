@@ -1,9 +1,27 @@
+import json
+from io import StringIO
+from unittest.mock import MagicMock
+from unittest.mock import call
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+
+def call_wait_for_db(**options):
+    """ Run wait_for_db without printing its progress"""
+    call_command('wait_for_db', stdout=StringIO(), stderr=StringIO(),
+                 **options)
+
 
 class CommandTests(TestCase):
 
@@ -11,14 +29,111 @@ class CommandTests(TestCase):
         """ Test waiting for db when db is available"""
 
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
+            call_wait_for_db()
+            cursor = gi.return_value.cursor.return_value.__enter__
+            cursor.return_value.execute.assert_called_once_with('SELECT 1')
             self.assertEqual(gi.call_count, 1)
 
+    @patch('random.uniform', side_effect=lambda low, high: high)
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db(self, ts, ru):
+        """ test waiting for db with exponential backoff"""
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.cursor.side_effect = (
+                [OperationalError] * 7 + [MagicMock()]
+            )
+            call_wait_for_db(initial_delay=1, max_delay=10)
+            self.assertEqual(gi.return_value.cursor.call_count, 8)
+            self.assertEqual(gi.return_value.close.call_count, 7)
+
+        self.assertEqual(
+            [args[0] for args, _ in ts.call_args_list],
+            [1, 2, 4, 8, 10, 10, 10],
+        )
+
+    def test_wait_for_db_every_alias(self):
+        """ Test that every requested database is checked"""
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            call_wait_for_db(databases=['default', 'replica'])
+
+        self.assertEqual(
+            gi.call_args_list,
+            [call('default'), call('replica')],
+        )
+
     @patch('time.sleep', return_value=True)
-    def test_wait_for_db(self, ts):
-        """ test waiting for db"""
+    def test_wait_for_db_timeout(self, ts):
+        """ Test exiting with the given status when the db never answers"""
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            gi.return_value.cursor.side_effect = OperationalError
+            with self.assertRaises(SystemExit) as exit:
+                call_wait_for_db(timeout=0, exit_code=3)
+
+        self.assertEqual(exit.exception.code, 3)
+        ts.assert_not_called()
+
+
+class DataCommandTests(TestCase):
+
+    def test_seed_data(self):
+        """ Test generating users with their tags, ingredients and recipes"""
+        call_command('seed_data', users=2, tags=3, ingredients=4, recipes=5,
+                     tags_per_recipe=2, ingredients_per_recipe=3,
+                     stdout=StringIO())
+
+        users = get_user_model().objects.filter(email__startswith='seed-')
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Tag.objects.filter(user__in=users).count(), 6)
+        self.assertEqual(Ingredient.objects.filter(user__in=users).count(), 8)
+        for recipe in Recipe.objects.filter(user__in=users):
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 3)
+            self.assertEqual(
+                {tag.user_id for tag in recipe.tags.all()},
+                {recipe.user_id},
+            )
+
+    def test_seed_data_existing_users(self):
+        """ Test that seeding twice with the same prefix fails"""
+        call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+
+    def test_benchmark(self):
+        """ Test benchmarking the API without keeping its writes"""
+        call_command('seed_data', users=1, tags=3, ingredients=3, recipes=5,
+                     stdout=StringIO())
+        recipes = Recipe.objects.count()
+        output = StringIO()
+
+        call_command('benchmark', iterations=3, warmup=1, stdout=output)
+
+        results = json.loads(output.getvalue())
+        self.assertEqual(results['recipes'], 5)
+        self.assertEqual(
+            set(results['scenarios']),
+            {'list', 'detail', 'filter', 'search', 'create', 'upload'},
+        )
+        for result in results['scenarios'].values():
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(
+                set(result['latency_ms']),
+                {'min', 'p50', 'p90', 'p99', 'max', 'mean'},
+            )
+            self.assertGreater(result['queries']['min'], 0)
+        self.assertEqual(Recipe.objects.count(), recipes)
+        self.assertFalse(Token.objects.exists())
+
+    def test_benchmark_list(self):
+        """ Test comparing the list representations on generated data"""
+        output = StringIO()
+
+        call_command('benchmark_list', rows=30, iterations=1, expand=True,
+                     stdout=output)
+
+        results = json.loads(output.getvalue())
+        self.assertEqual(results['rows'], 30)
+        self.assertGreater(results['speedup'], 0)
+        self.assertEqual(set(results['values']), {'min_ms', 'p50_ms'})
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,187 @@
+import gzip
+from unittest import mock
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import compression
+from core.compression import negotiate_encoding
+from core.middleware import CompressionMiddleware
+from core.models import Recipe
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def decompress(response):
+    """ Return the decompressed body of a response"""
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    if response['Content-Encoding'] == 'br':
+        return compression.brotli.decompress(content)
+
+    return gzip.decompress(content)
+
+
+class NegotiateEncodingTests(TestCase):
+    """ Test picking the content coding of a response"""
+
+    def test_negotiate_encoding(self):
+        """ Test the Accept-Encoding header with qualities"""
+        for header, encoding in (
+            ('', None),
+            ('identity', None),
+            ('gzip', 'gzip'),
+            ('gzip;q=0', None),
+            ('deflate, gzip;q=0.5', 'gzip'),
+            ('*', compression.available_encodings()[0]),
+            ('*;q=0, gzip', 'gzip'),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(negotiate_encoding(header), encoding)
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_prefer_brotli(self):
+        """ Test that brotli wins unless gzip is preferred"""
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate_encoding('gzip, br;q=0.8'), 'gzip')
+
+    def test_without_brotli(self):
+        """ Test falling back to gzip without brotli"""
+        with mock.patch('core.compression.brotli', None):
+            self.assertEqual(negotiate_encoding('br, gzip'), 'gzip')
+            self.assertIsNone(negotiate_encoding('br'))
+
+
+class CompressionMiddlewareTests(TestCase):
+    """ Test compressing API responses"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(40):
+            Tag.objects.create(user=self.user, name=f'Tag number {i}')
+
+    def test_compress_large_list(self):
+        """ Test that a large list is sent compressed"""
+        plain = self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertLess(len(res.content), len(plain.content))
+        self.assertEqual(decompress(res), plain.content)
+        self.assertEqual(res['ETag'], f'W/{plain["ETag"]}')
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_compress_brotli(self):
+        """ Test that brotli is used when the client accepts it"""
+        plain = self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(decompress(res), plain.content)
+
+    def test_small_response_not_compressed(self):
+        """ Test that bodies under the threshold are sent as they are"""
+        with self.settings(COMPRESSION_MIN_SIZE=100000):
+            res = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_conditional_request_with_weak_etag(self):
+        """ Test revalidating a compressed response"""
+        res = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        res = self.client.get(
+            TAGS_URL,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_compress_streaming_export(self):
+        """ Test that streamed exports are compressed chunk by chunk"""
+        for i in range(5):
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=5,
+            )
+        plain = self.client.get(EXPORT_URL)
+        plain_content = b''.join(plain.streaming_content)
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(decompress(res), plain_content)
+
+    def test_cached_response_compressed_once(self):
+        """ Test that the compressed body of a cached response is reused"""
+        with mock.patch(
+            'core.middleware.compress',
+            wraps=compression.compress,
+        ) as compress:
+            first = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+
+    def test_skip_uncompressible_responses(self):
+        """ Test that images, ranges and encoded bodies are left alone"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        body = b'x' * 1000
+        image = HttpResponse(body, content_type='image/jpeg')
+        partial = HttpResponse(body, content_type='text/plain', status=206)
+        encoded = HttpResponse(body, content_type='text/plain')
+        encoded['Content-Encoding'] = 'identity'
+        no_transform = HttpResponse(body, content_type='text/plain')
+        no_transform['Cache-Control'] = 'no-transform'
+
+        for response in (image, partial, encoded, no_transform):
+            middleware = CompressionMiddleware(lambda request: response)
+            with self.subTest(response=response):
+                self.assertEqual(middleware(request).content, body)
+
+    def test_skip_html_and_csrf_responses(self):
+        """ Test that pages which may hold a CSRF token are not compressed,
+        to keep the token out of reach of BREACH"""
+        body = b'x' * 1000
+        html = HttpResponse(body, content_type='text/html')
+        middleware = CompressionMiddleware(lambda request: html)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(middleware(request).content, body)
+
+        def view(request):
+            get_token(request)
+            return HttpResponse(body, content_type='application/json')
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(view)(request)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
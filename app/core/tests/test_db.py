@@ -0,0 +1,83 @@
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import TestCase
+from django.test import override_settings
+
+from core.db import check_connections
+from core.db import connection_metrics
+
+
+def persistent_connection(usable=True, alias='default'):
+    """ Return a stand-in for an open connection kept from a request"""
+    return Mock(
+        alias=alias,
+        connection=object(),
+        in_atomic_block=False,
+        is_usable=Mock(return_value=usable),
+    )
+
+
+class ConnectionMetricsTests(TestCase):
+    """ Test counting and health checking database connections"""
+
+    def setUp(self):
+        connection_metrics.reset()
+
+    def test_count_opened(self):
+        """ Test that new connections are counted"""
+        connection_created.send(
+            sender=connection.__class__,
+            connection=connection,
+        )
+
+        self.assertEqual(connection_metrics.snapshot(), {
+            'default': {'opened': 1, 'reused': 0, 'unusable': 0},
+        })
+
+    def test_reused_connection_checked(self):
+        """ Test that reused connections are counted after a check"""
+        reused = persistent_connection()
+        closed = Mock(alias='other', connection=None)
+
+        with patch('core.db.connections.all', return_value=[reused, closed]):
+            check_connections()
+
+        reused.is_usable.assert_called_once_with()
+        reused.close.assert_not_called()
+        self.assertEqual(connection_metrics.snapshot(), {
+            'default': {'opened': 0, 'reused': 1, 'unusable': 0},
+        })
+
+    def test_unusable_connection_closed(self):
+        """ Test that broken connections are closed before the request"""
+        broken = persistent_connection(usable=False)
+
+        with patch('core.db.connections.all', return_value=[broken]):
+            check_connections()
+
+        broken.close.assert_called_once_with()
+        self.assertEqual(
+            connection_metrics.snapshot()['default']['unusable'],
+            1,
+        )
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """ Test that reused connections are trusted without checks"""
+        reused = persistent_connection(usable=False)
+
+        with patch('core.db.connections.all', return_value=[reused]):
+            check_connections()
+
+        reused.is_usable.assert_not_called()
+        reused.close.assert_not_called()
+
+    def test_request_checks_connections(self):
+        """ Test that the check runs when a request starts"""
+        with patch('core.signals.check_connections') as check:
+            self.client.get('/admin/login/')
+
+        check.assert_called_once_with()
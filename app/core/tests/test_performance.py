@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.performance import RequestTimings
+from core.performance import endpoint_histograms
+
+from recipe.cache import bump_data_version
+
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def server_timing(response):
+    """ Return the Server-Timing metrics of a response by name"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+
+    return metrics
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """ Test the request performance instrumentation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+        bump_data_version(self.user.pk)
+        endpoint_histograms.reset()
+
+    def test_server_timing_header(self):
+        """ Test that the response reports its queries and timings"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(
+            set(metrics),
+            {'db', 'serialize', 'render', 'total'},
+        )
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(metrics['render']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']),
+            float(metrics['db']['dur']) + float(metrics['render']['dur']),
+        )
+
+    def test_structured_log_line(self):
+        """ Test that every request is logged as a JSON line, by the
+        handler of the shipped LOGGING setting"""
+        logger = logging.getLogger('core.performance')
+        self.assertTrue(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.handlers)
+
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            self.client.get(TAGS_URL)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], TAGS_URL)
+        self.assertEqual(line['endpoint'], 'GET recipe:tag-list')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertEqual(
+            set(line),
+            {'method', 'path', 'endpoint', 'status', 'total_ms', 'db_ms',
+             'queries', 'serialize_ms', 'render_ms'},
+        )
+
+    def test_serialize_timing(self):
+        """ Test that building the representation of a list is timed,
+        with the serializers and from values() rows"""
+        for i in range(20):
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=5,
+            )
+        for values_list in (False, True):
+            bump_data_version(self.user.pk)
+            with self.subTest(values_list=values_list), \
+                    override_settings(RECIPE_VALUES_LIST=values_list):
+                res = self.client.get(RECIPE_URL)
+
+                metrics = server_timing(res)
+                self.assertGreater(float(metrics['serialize']['dur']), 0)
+
+    def test_nested_measures_counted_once(self):
+        """ Test that nested blocks of one timing are not added twice"""
+        timings = RequestTimings()
+
+        with timings.measure('serialize'):
+            with timings.measure('serialize'):
+                pass
+            inner = timings.serialize
+
+        self.assertEqual(inner, 0)
+        self.assertGreater(timings.serialize, 0)
+
+    def test_histograms_disabled_by_default(self):
+        """ Test that no histogram is kept without a dump file"""
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(endpoint_histograms.snapshot(), {})
+
+    def test_histogram_dump(self):
+        """ Test dumping the request durations by endpoint"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'histograms.json')
+            with override_settings(PERFORMANCE_HISTOGRAM_FILE=path,
+                                   PERFORMANCE_HISTOGRAM_INTERVAL=0):
+                self.client.get(TAGS_URL)
+                self.client.get(TAGS_URL)
+
+            with open(f'{path}.{os.getpid()}') as dump:
+                histograms = json.load(dump)
+
+        buckets = histograms['GET recipe:tag-list']
+        self.assertEqual(sum(buckets.values()), 2)
+        self.assertIn('+Inf', buckets)
+        self.assertTrue(all(re.match(r'^\d+$|^\+Inf$', b) for b in buckets))
@@ -0,0 +1,184 @@
+import io
+import json
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('title', 'Crème brûlée \u2028\u2029 "quoted"'),
+    ('price', Decimal('5.50')),
+    ('ratio', 0.1),
+    ('created', datetime(2020, 1, 2, 3, 4, 5, 678901,
+                         tzinfo=timezone.utc)),
+    ('error', gettext_lazy('This field is required.')),
+    ('tags', [1, 2, None, True]),
+    ('nested', {'a': [], 'b': {}, 3: 'int key'}),
+])
+
+
+class FastJSONRendererTests(TestCase):
+    """ Test that the fast renderer matches the DRF renderer"""
+
+    def test_same_output(self):
+        """ Test rendering with orjson gives the DRF bytes"""
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE),
+            JSONRenderer().render(SAMPLE),
+        )
+
+    def test_same_output_without_orjson(self):
+        """ Test the pure Python fallback"""
+        with mock.patch('core.renderers.orjson', None):
+            content = FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(content, JSONRenderer().render(SAMPLE))
+
+    def test_indented_output(self):
+        """ Test that indentation is left to the DRF renderer"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE, media_type),
+            JSONRenderer().render(SAMPLE, media_type),
+        )
+
+    def test_unsupported_data(self):
+        """ Test that data orjson cannot encode falls back"""
+        data = {'big': 2 ** 70}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+
+class FastJSONParserTests(TestCase):
+    """ Test parsing JSON bodies"""
+
+    def _parse(self, body):
+        return FastJSONParser().parse(io.BytesIO(body))
+
+    def test_parse(self):
+        """ Test parsing a UTF-8 body"""
+        self.assertEqual(
+            self._parse('{"title": "Crème", "tags": [1, 2]}'.encode()),
+            {'title': 'Crème', 'tags': [1, 2]},
+        )
+
+    def test_parse_errors(self):
+        """ Test that malformed bodies and NaN raise parse errors"""
+        for body in (b'{"title":', b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                self._parse(body)
+            with mock.patch('core.parsers.orjson', None), \
+                    self.assertRaises(ParseError):
+                self._parse(body)
+
+
+@skipUnless(settings.API_MSGPACK, 'msgpack is not installed')
+class MessagePackTests(TestCase):
+    """ Test negotiating MessagePack requests and responses"""
+
+    def setUp(self):
+        import msgpack
+        self.msgpack = msgpack
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_list_recipes(self):
+        """ Test listing recipes as MessagePack"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=30,
+            price='8.00',
+        )
+        recipe.tags.add(self.tag)
+        json_res = self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            self.msgpack.unpackb(res.content, raw=False),
+            json.loads(json_res.content),
+        )
+
+    def test_create_recipe(self):
+        """ Test creating a recipe from a MessagePack body"""
+        body = self.msgpack.packb({
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '8.00',
+            'tags': [self.tag.id],
+            'ingredients': [],
+        })
+
+        res = self.client.post(
+            RECIPE_URL,
+            body,
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = self.msgpack.unpackb(res.content, raw=False)
+        self.assertEqual(data['tags'], [self.tag.id])
+        self.assertTrue(Recipe.objects.filter(title='Curry').exists())
+
+    def test_invalid_body(self):
+        """ Test that a malformed MessagePack body is a bad request"""
+        res = self.client.post(
+            RECIPE_URL,
+            b'\xc1',
+            content_type='application/msgpack',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_token(self):
+        """ Test that the token view negotiates MessagePack"""
+        body = self.msgpack.packb({
+            'email': 'test@recipe.com',
+            'password': 'testpass',
+        })
+
+        res = APIClient().post(
+            TOKEN_URL,
+            body,
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', self.msgpack.unpackb(res.content, raw=False))
@@ -0,0 +1,169 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import get_pin_cache
+from core.models import Tag
+from core.routers import ReplicaRouter
+from core.routers import start_replica_reads
+from core.routers import stop_replica_reads
+
+from recipe.cache import bump_data_version
+
+
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+REPLICA = 'replica'
+
+
+class ReplicaRouterTests(TestCase):
+    """ Test routing queries between the primary and the replicas"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def tearDown(self):
+        stop_replica_reads()
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_reads_use_replica_when_enabled(self):
+        """ Test that only enabled threads read from the replicas"""
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+        start_replica_reads(True)
+
+        self.assertEqual(self.router.db_for_read(Tag), REPLICA)
+
+    def test_reads_without_replicas(self):
+        """ Test that reads stay on the primary without replicas"""
+        start_replica_reads(True)
+
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_writes_use_primary(self):
+        """ Test that writes go to the primary and are recorded"""
+        start_replica_reads(True)
+
+        self.assertEqual(self.router.db_for_write(Tag), 'default')
+        self.assertTrue(stop_replica_reads())
+        self.assertFalse(stop_replica_reads())
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_migrate_primary_only(self):
+        """ Test that replicas are never migrated"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaPinningTests(TestCase):
+    """ Test reading the tags API from a SQLite replica stand-in whose
+    rows differ from the primary"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': cls.replica_path,
+        }
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(get_user_model())
+            editor.create_model(Tag)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        os.remove(cls.replica_path)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.user.save(using=REPLICA, force_insert=True)
+        Tag.objects.create(user=self.user, name='Primary')
+        Tag.objects.using(REPLICA).create(user_id=self.user.id, name='Stale')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token client')
+        get_pin_cache().clear()
+
+    def tearDown(self):
+        with connections[REPLICA].cursor() as cursor:
+            for model in (Tag, get_user_model()):
+                cursor.execute(f'DELETE FROM {model._meta.db_table}')
+
+    def _names(self):
+        """ Return the tag names listed by the API"""
+        bump_data_version(self.user.id)
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [tag['name'] for tag in res.data['results']]
+
+    def test_safe_requests_read_replica(self):
+        """ Test that GET requests are answered from the replica"""
+        self.assertEqual(self._names(), ['Stale'])
+
+    def test_client_pinned_after_write(self):
+        """ Test that a client reads its own writes from the primary"""
+        res = self.client.post(TAGS_URL, {'name': 'New'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self._names(), ['Primary', 'New'])
+
+        other = APIClient()
+        other.force_authenticate(self.user)
+        other.credentials(HTTP_AUTHORIZATION='Token other')
+        res = other.get(TAGS_URL, {'page_size': 10})
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Stale'],
+        )
+
+    @override_settings(DB_REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        """ Test that the client reads the replica once the pin expires"""
+        self.client.post(TAGS_URL, {'name': 'New'})
+
+        self.assertEqual(self._names(), ['Stale'])
+
+    def test_new_token_read_from_primary(self):
+        """ Test that a token is accepted before it reaches the replicas"""
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'test@recipe.com',
+            'password': 'testpass',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+
+        res = client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Stale'],
+        )
+
+    def test_failed_request_does_not_pin(self):
+        """ Test that requests without writes do not pin the client"""
+        res = self.client.post(TAGS_URL, {'name': ''})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self._names(), ['Stale'])
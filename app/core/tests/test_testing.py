@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.testing import QueryBudgetMixin
+
+
+class QueryBudgetMixinTests(QueryBudgetMixin, TestCase):
+    """ Test the query budget assertions"""
+
+    def test_within_budget(self):
+        """ Test that a block within its budget passes"""
+        with self.assertQueryBudget(1) as queries:
+            get_user_model().objects.count()
+
+        self.assertEqual(len(queries), 1)
+
+    def test_over_budget_lists_queries(self):
+        """ Test that exceeding the budget fails with the captured SQL"""
+        with self.assertRaises(AssertionError) as error:
+            with self.assertQueryBudget(1, msg='Users: '):
+                get_user_model().objects.count()
+                get_user_model().objects.exists()
+
+        message = str(error.exception)
+        self.assertIn('Users: 2 queries run, over the budget of 1:', message)
+        self.assertIn('1. SELECT COUNT(*)', message)
+        self.assertIn('2. SELECT', message)
@@ -0,0 +1,140 @@
+from django.db import connection
+from django.db import transaction
+
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+from recipe.serializers import RecipeImportSerializer
+
+
+IMPORT_BATCH_SIZE = 1000
+RELATIONS = (
+    # (recipe field, name field, related model, through column)
+    ('tags', 'tag_names', Tag, 'tag_id'),
+    ('ingredients', 'ingredient_names', Ingredient, 'ingredient_id'),
+)
+
+
+def _existing_ids(model, user, items, field):
+    """ Return the ids referenced by the items that belong to the user"""
+    ids = {pk for item in items for pk in item[field]}
+    if not ids:
+        return set()
+
+    return set(
+        model.objects.filter(
+            user=user,
+            id__in=ids,
+        ).values_list('id', flat=True)
+    )
+
+
+def _ids_by_name(model, user, names):
+    """ Map names to ids for the user, creating the missing objects"""
+    if not names:
+        return {}
+
+    by_name = dict(
+        model.objects.filter(
+            user=user,
+            name__in=names,
+        ).values_list('name', 'id')
+    )
+    missing = [model(user=user, name=name) for name in names
+               if name not in by_name]
+    model.objects.bulk_create(missing, batch_size=IMPORT_BATCH_SIZE)
+    if connection.features.can_return_ids_from_bulk_insert:
+        by_name.update((obj.name, obj.id) for obj in missing)
+    elif missing:
+        by_name.update(
+            model.objects.filter(
+                user=user,
+                name__in=[obj.name for obj in missing],
+            ).values_list('name', 'id')
+        )
+
+    return by_name
+
+
+def _create_recipes(recipes):
+    """ Insert the recipes in batches, falling back to one INSERT each
+    on databases that can not return the ids of a bulk insert"""
+    if connection.features.can_return_ids_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes, batch_size=IMPORT_BATCH_SIZE)
+    else:
+        for recipe in recipes:
+            recipe.save(force_insert=True)
+
+
+def import_recipes(user, data):
+    """ Validate and create many recipes for the user.
+
+    Returns the ids of the created recipes and a list of per item errors
+    """
+    errors = []
+    items = []
+    for index, item in enumerate(data):
+        serializer = RecipeImportSerializer(data=item)
+        if serializer.is_valid():
+            items.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    existing = {
+        field: _existing_ids(model, user, [item for _, item in items], field)
+        for field, _, model, _ in RELATIONS
+    }
+    valid = []
+    for index, item in items:
+        item_errors = {}
+        for field, _, _, _ in RELATIONS:
+            missing = sorted(set(item[field]) - existing[field])
+            if missing:
+                item_errors[field] = [
+                    f'Invalid pk "{pk}" - object does not exist.'
+                    for pk in missing
+                ]
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            valid.append(item)
+    errors.sort(key=lambda error: error['index'])
+
+    if not valid:
+        return [], errors
+
+    with transaction.atomic():
+        related_ids = []
+        for field, name_field, model, _ in RELATIONS:
+            names = {name for item in valid for name in item[name_field]}
+            by_name = _ids_by_name(model, user, names)
+            related_ids.append([
+                set(item[field]) | {by_name[name] for name in item[name_field]}
+                for item in valid
+            ])
+
+        recipes = [
+            Recipe(
+                user=user,
+                title=item['title'],
+                time_minutes=item['time_minutes'],
+                price=item['price'],
+                link=item.get('link', ''),
+            )
+            for item in valid
+        ]
+        _create_recipes(recipes)
+
+        for (field, _, _, column), ids in zip(RELATIONS, related_ids):
+            through = getattr(Recipe, field).through
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe.id, **{column: pk})
+                    for recipe, pks in zip(recipes, ids)
+                    for pk in pks
+                ],
+                batch_size=IMPORT_BATCH_SIZE,
+            )
+
+    return [recipe.id for recipe in recipes], errors
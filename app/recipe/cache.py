@@ -0,0 +1,98 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.conditional import not_modified_response
+from recipe.conditional import set_validators
+
+
+VERSION_KEY = 'recipe-api:version:{user_id}'
+RESPONSE_KEY = 'recipe-api:response:{user_id}:{version}:{format}:{path}'
+
+
+def get_cache():
+    """ Return the cache backend configured for the recipe API"""
+    return caches[getattr(settings, 'RECIPE_API_CACHE', 'default')]
+
+
+def get_data_version(user_id):
+    """ Return the current data version of the user"""
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_data_version(user_id):
+    """ Invalidate every cached response of the user"""
+    key = VERSION_KEY.format(user_id=user_id)
+    get_cache().set(key, uuid.uuid4().hex, None)
+
+
+def response_cache_key(request):
+    """ Return the cache key of the response to the request"""
+    user_id = request.user.pk
+
+    return RESPONSE_KEY.format(
+        user_id=user_id,
+        version=get_data_version(user_id),
+        format=request.accepted_renderer.format,
+        path=hashlib.md5(request.get_full_path().encode()).hexdigest(),
+    )
+
+
+class CachedResponseMixin:
+    """ Cache list and retrieve responses per user and data version.
+
+    When the view also answers conditional requests, its validators are
+    cached with the data so revalidation of a cached response is free.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def _cached_response(self, view, request, *args, **kwargs):
+        """ Return the cached data or cache the response of the view"""
+        cache = get_cache()
+        key = response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            data, validators = cached
+            if validators is None:
+                response = Response(data)
+            else:
+                response = not_modified_response(request, *validators)
+                if response is not None:
+                    return response
+                response = set_validators(Response(data), *validators)
+            # Let the compression middleware reuse the compressed body
+            response.compressed_cache_key = key
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                (response.data, getattr(self, 'validators', None)),
+                getattr(settings, 'RECIPE_API_CACHE_TIMEOUT', 300),
+            )
+            response.compressed_cache_key = key
+
+        return response
@@ -0,0 +1,137 @@
+import hashlib
+
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(request, *state):
+    """ Return a strong ETag for the representation of the given state"""
+    parts = [
+        request.user.pk,
+        request.get_full_path(),
+        request.accepted_renderer.format,
+    ] + list(state)
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+
+    return f'"{digest}"'
+
+
+def set_validators(response, etag, last_modified):
+    """ Add the ETag and Last-Modified headers to the response"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+    return response
+
+
+def not_modified_response(request, etag, last_modified):
+    """ Return a 304 (or 412) response when the client copy is current"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+
+    return response
+
+
+def _timestamp(value):
+    """ Return the whole seconds of a datetime, as used by HTTP dates"""
+    return int(value.timestamp()) if value is not None else None
+
+
+class ConditionalGetMixin:
+    """ Answer conditional list and retrieve requests with 304 responses.
+
+    The validators come from an aggregate over `updated_at` so unchanged
+    resources are never serialized. Lists are only validated by ETag.
+    """
+    validators = None
+
+    def get_last_modified_expression(self):
+        """ Return the expression giving the last change of one object"""
+        return F('updated_at')
+
+    def get_validator_querysets(self):
+        """ Return the querysets whose changes alter the list"""
+        return [self.filter_queryset(self.get_queryset())]
+
+    def get_list_last_modified_fields(self):
+        """ Return the fields whose latest value dates the list"""
+        return ('updated_at',)
+
+    def get_list_validators(self):
+        """ Return the ETag of the current list.
+
+        Lists get no Last-Modified: deleting a row never moves the latest
+        `updated_at` forward, while the row count in the ETag changes.
+        """
+        fields = self.get_list_last_modified_fields()
+        state = []
+        for queryset in self.get_validator_querysets():
+            aggregates = queryset.prefetch_related(None).order_by().aggregate(
+                # Related fields join rows that must not be counted twice
+                count=Count('id', distinct=len(fields) > 1),
+                **{
+                    f'last_modified_{index}': Max(field)
+                    for index, field in enumerate(fields)
+                },
+            )
+            values = [
+                aggregates[f'last_modified_{index}']
+                for index in range(len(fields))
+            ]
+            state += [aggregates['count']] + values
+
+        return make_etag(self.request, *state), None
+
+    def get_detail_validators(self):
+        """ Return the ETag and Last-Modified of the requested object"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).order_by().filter(**{
+            self.lookup_field: self.kwargs[lookup_url_kwarg],
+        }).annotate(
+            last_modified=self.get_last_modified_expression(),
+        ).values_list('last_modified', flat=True)
+        if not rows:
+            return None
+
+        return make_etag(self.request, rows[0]), _timestamp(rows[0])
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            self.get_list_validators(),
+            super().list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            self.get_detail_validators(),
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def _conditional_response(self, validators, view, request, *args,
+                              **kwargs):
+        """ Short circuit with 304 or add the validators to the response"""
+        if validators is None:
+            return view(request, *args, **kwargs)
+
+        response = not_modified_response(request, *validators)
+        if response is not None:
+            return response
+
+        self.validators = validators
+        return set_validators(view(request, *args, **kwargs), *validators)
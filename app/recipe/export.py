@@ -0,0 +1,121 @@
+import csv
+import json
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+EXPORT_CHUNK_SIZE = 2000
+CSV_NAME_SEPARATOR = '|'
+# Escapes separators and itself inside the names of a CSV cell
+CSV_NAME_ESCAPE = '\\'
+
+
+class Echo:
+    """ File-like object that returns what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def _names_by_recipe(through, field, recipe_ids):
+    """ Map each recipe id to the related names of the given through table"""
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by(
+        f'{field}__name',
+    ).values_list('recipe_id', f'{field}__name')
+    for recipe_id, name in rows:
+        names[recipe_id].append(name)
+
+    return names
+
+
+def _flush(rows):
+    """ Attach tag and ingredient names to a chunk of recipe rows"""
+    recipe_ids = [row['id'] for row in rows]
+    tags = _names_by_recipe(Recipe.tags.through, 'tag', recipe_ids)
+    ingredients = _names_by_recipe(
+        Recipe.ingredients.through,
+        'ingredient',
+        recipe_ids,
+    )
+    for row in rows:
+        row['price'] = str(row['price'])
+        row['tags'] = tags[row['id']]
+        row['ingredients'] = ingredients[row['id']]
+        yield row
+
+
+def iter_recipe_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Stream recipe rows with their names, one chunk in memory at a time"""
+    rows = []
+    recipes = queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for row in recipes:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield from _flush(rows)
+            rows = []
+    if rows:
+        yield from _flush(rows)
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Yield one JSON document per recipe"""
+    for row in iter_recipe_rows(queryset, chunk_size):
+        yield json.dumps(row) + '\n'
+
+
+def join_names(names):
+    """ Return the CSV cell of a list of names, escaping the separator"""
+    return CSV_NAME_SEPARATOR.join(
+        name.replace(
+            CSV_NAME_ESCAPE,
+            CSV_NAME_ESCAPE * 2,
+        ).replace(
+            CSV_NAME_SEPARATOR,
+            CSV_NAME_ESCAPE + CSV_NAME_SEPARATOR,
+        )
+        for name in names
+    )
+
+
+def split_names(cell):
+    """ Return the list of names of a CSV cell built by join_names"""
+    if not cell:
+        return []
+    names, name, escaped = [], [], False
+    for char in cell:
+        if escaped:
+            name.append(char)
+            escaped = False
+        elif char == CSV_NAME_ESCAPE:
+            escaped = True
+        elif char == CSV_NAME_SEPARATOR:
+            names.append(''.join(name))
+            name = []
+        else:
+            name.append(char)
+    names.append(''.join(name))
+
+    return names
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Yield a CSV header followed by one line per recipe"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS + ('tags', 'ingredients'))
+    for row in iter_recipe_rows(queryset, chunk_size):
+        yield writer.writerow(
+            [row[field] for field in EXPORT_FIELDS] + [
+                join_names(row['tags']),
+                join_names(row['ingredients']),
+            ]
+        )
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
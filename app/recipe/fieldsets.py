@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsSerializerMixin:
+    """ Serializer mixin keeping only the `fields` of its context and
+    nesting the `expand` ones, for the top level objects only"""
+
+    # Field name to a callable returning the nested field it expands to
+    expandable_fields = {}
+
+    def _is_top_level(self):
+        return self.root is self or self.root is self.parent
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+
+        for name in self.context.get('expand', ()):
+            fields[name] = self.expandable_fields[name]()
+        selected = self.context.get('fields')
+        if selected is not None:
+            fields = OrderedDict(
+                (name, field) for name, field in fields.items()
+                if name in selected
+            )
+
+        return fields
+
+
+class SparseFieldsetMixin:
+    """ View mixin narrowing the representation of safe requests to the
+    comma separated `fields` query parameter and nesting the related
+    objects named by `expand`.
+
+    get_fieldset_columns() tells which model columns the selected fields
+    need, so get_queryset() can defer the others with only().
+    """
+
+    # Serializer field name to the model columns it reads, when they
+    # differ from the field name
+    fieldset_sources = {}
+
+    def _list_param(self, name):
+        """ Return the names of a comma separated query parameter"""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+
+        return [item for item in value.split(',') if item]
+
+    def get_fieldset(self):
+        """ Return the requested field names (None for every field) and
+        the names to expand, validated against the serializer"""
+        if hasattr(self, '_fieldset'):
+            return self._fieldset
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            self._fieldset = (None, ())
+            return self._fieldset
+
+        serializer_class = self.get_serializer_class()
+        available = serializer_class(context={}).fields
+        expandable = getattr(serializer_class, 'expandable_fields', {})
+        fields = self._list_param('fields')
+        expand = self._list_param('expand') or []
+
+        errors = {}
+        if fields is not None:
+            unknown = [name for name in fields if name not in available]
+            if unknown or not fields:
+                errors['fields'] = [
+                    f'Unknown fields: {", ".join(unknown)}' if unknown
+                    else 'Expected a list of fields'
+                ]
+        unknown = [name for name in expand if name not in expandable]
+        if unknown:
+            errors['expand'] = [f'Cannot expand: {", ".join(unknown)}']
+        if errors:
+            raise ValidationError(errors)
+
+        if fields is not None:
+            fields = set(fields) | set(expand)
+        self._fieldset = (fields, tuple(dict.fromkeys(expand)))
+
+        return self._fieldset
+
+    def get_fieldset_columns(self, fields):
+        """ Return the model columns read by the given serializer fields,
+        with the primary key and the ordering columns"""
+        model = self.queryset.model
+        columns = [model._meta.pk.name]
+        for order in self.get_ordering():
+            columns.append(order.lstrip('-'))
+        for name in fields:
+            columns.extend(self.fieldset_sources.get(name, (name,)))
+
+        concrete = []
+        for column in dict.fromkeys(columns):
+            try:
+                field = model._meta.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                concrete.append(column)
+
+        return concrete
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.get_fieldset()
+        context['fields'] = fields
+        context['expand'] = expand
+
+        return context
@@ -0,0 +1,179 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db import transaction
+from django.utils import timezone
+
+from PIL import Image
+from PIL import ImageOps
+
+from core.models import Recipe
+
+from recipe.cache import bump_data_version
+
+
+logger = logging.getLogger(__name__)
+
+# Formats of every variant, with the Pillow encoder and its options
+VARIANT_FORMATS = (
+    ('jpeg', 'JPEG', {'quality': 85, 'optimize': True}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+)
+# Encoders keeping the transparency of the image, the others get it
+# flattened on FLATTEN_BACKGROUND
+ALPHA_ENCODERS = ('WEBP',)
+FLATTEN_BACKGROUND = (255, 255, 255)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_variants():
+    """ Return the name and bounding box of every image variant"""
+    return getattr(settings, 'RECIPE_IMAGE_VARIANTS', {
+        'thumbnail': (200, 200),
+        'medium': (800, 800),
+    })
+
+
+def get_executor():
+    """ Return the thread pool processing recipe images"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECIPE_IMAGE_WORKERS', 2),
+                thread_name_prefix='recipe-image',
+            )
+
+    return _executor
+
+
+def variant_name(image_name, variant, extension):
+    """ Return the storage name of a variant of the image"""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.{extension}')
+
+
+def variant_source_prefix(name):
+    """ Return the storage name, up to its extension, of the image a
+    variant was built from, None when the name is not a variant"""
+    directory, filename = os.path.split(name)
+    if os.path.basename(directory) != 'variants' or '_' not in filename:
+        return None
+    stem = filename.rsplit('_', 1)[0]
+
+    return os.path.join(os.path.dirname(directory), f'{stem}.')
+
+
+def variant_names(image_name):
+    """ Return the storage names of every variant, by variant and format"""
+    return {
+        variant: {
+            extension: variant_name(image_name, variant, extension)
+            for extension, _, _ in VARIANT_FORMATS
+        }
+        for variant in get_variants()
+    }
+
+
+def _encode(image, encoder, options):
+    """ Return the bytes of the image in the given format"""
+    buffer = io.BytesIO()
+    image.save(buffer, format=encoder, **options)
+
+    return buffer.getvalue()
+
+
+def _normalize(image):
+    """ Return the image upright, as RGB or RGBA when it is transparent"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'PA') or \
+            'transparency' in image.info:
+        return image.convert('RGBA')
+
+    return image.convert('RGB')
+
+
+def _flatten(image):
+    """ Return the image as RGB, laid on FLATTEN_BACKGROUND"""
+    if image.mode != 'RGBA':
+        return image
+    flat = Image.new('RGB', image.size, FLATTEN_BACKGROUND)
+    flat.paste(image, mask=image.getchannel('A'))
+
+    return flat
+
+
+def create_variants(image_name):
+    """ Write the resized and converted variants of a stored image"""
+    with default_storage.open(image_name) as original:
+        image = Image.open(original)
+        image.load()
+    image = _normalize(image)
+
+    names = variant_names(image_name)
+    for variant, size in get_variants().items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for extension, encoder, options in VARIANT_FORMATS:
+            name = names[variant][extension]
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            if encoder not in ALPHA_ENCODERS:
+                frame = _flatten(resized)
+            else:
+                frame = resized
+            default_storage.save(
+                name,
+                ContentFile(_encode(frame, encoder, options)),
+            )
+
+
+def delete_variants(image_name):
+    """ Remove the stored variants of an image"""
+    for names in variant_names(image_name).values():
+        for name in names.values():
+            default_storage.delete(name)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """ Build the variants of a recipe image and record the outcome,
+    unless the image was replaced in the meantime"""
+    try:
+        try:
+            create_variants(image_name)
+            image_status = Recipe.IMAGE_READY
+        except Exception:
+            logger.exception('Cannot process recipe image %s', image_name)
+            image_status = Recipe.IMAGE_FAILED
+
+        recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+        user_ids = list(recipes.values_list('user_id', flat=True))
+        if recipes.update(image_status=image_status,
+                          updated_at=timezone.now()):
+            bump_data_version(user_ids[0])
+        elif not Recipe.objects.filter(image=image_name).exists():
+            delete_variants(image_name)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def schedule_image_processing(recipe):
+    """ Process the recipe image in the background once it is committed"""
+    image_name = recipe.image.name
+    transaction.on_commit(lambda: get_executor().submit(
+        process_recipe_image,
+        recipe.pk,
+        image_name,
+    ))
@@ -0,0 +1,179 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse
+from django.http import Http404
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.models import Recipe
+
+from recipe.images import variant_source_prefix
+
+
+# Stored names never change content: uploads are content addressed and
+# variants are rebuilt from the same source
+MEDIA_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """ File object reading a single byte range. It keeps the descriptor
+    of the file so WSGI servers can still send it with sendfile"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """ Return the (start, end) of a single byte range request, None to
+    send the whole file, or raise ValueError when it cannot be served"""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+
+    return start, end
+
+
+def media_etag(name, stat):
+    """ Return a strong ETag for a stored file"""
+    state = f'{name}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    return f'"{hashlib.md5(state.encode()).hexdigest()}"'
+
+
+def owned_media_filter(user, name):
+    """ Return a condition matching the recipes of the user referencing
+    the stored image, or the image a variant was built from"""
+    prefix = variant_source_prefix(name)
+    if prefix is not None:
+        return Q(user=user, image__startswith=prefix)
+
+    return Q(user=user, image=name)
+
+
+def offload_response(path, name):
+    """ Return an empty response letting the web server send the file,
+    None when no offload is configured"""
+    offload = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if not offload:
+        return None
+
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(path)[0] or
+        'application/octet-stream',
+    )
+    if offload == 'x-sendfile':
+        response['X-Sendfile'] = path
+    elif offload == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = getattr(
+            settings,
+            'MEDIA_ACCEL_REDIRECT_PREFIX',
+            '/protected/',
+        ) + name
+    else:
+        raise ValueError(f'Unknown media offload "{offload}"')
+
+    return response
+
+
+def file_response(request, path):
+    """ Return the file, or the requested byte range of it, with
+    conditional GET support"""
+    stat = os.stat(path)
+    etag = media_etag(path, stat)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(stat.st_mtime),
+    )
+    if response is not None:
+        return response
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            status=206,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+
+    return response
+
+
+class MediaView(APIView):
+    """ Serve the recipe images of the authenticated user"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404()
+        name = os.path.relpath(full_path, settings.MEDIA_ROOT)
+        owned = Recipe.objects.filter(
+            owned_media_filter(request.user, name),
+        ).exists()
+        if not owned or not os.path.isfile(full_path):
+            raise Http404()
+
+        response = offload_response(full_path, name)
+        if response is None:
+            response = file_response(request, full_path)
+        response['Cache-Control'] = MEDIA_CACHE_CONTROL
+
+        return response
@@ -0,0 +1,201 @@
+import difflib
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.lookups import PostgresSimpleLookup
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import BigIntegerField
+from django.db.models import Case
+from django.db.models import CharField
+from django.db.models import Exists
+from django.db.models import ExpressionWrapper
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+
+from core.models import Recipe
+
+
+SEARCH_CONFIG = 'simple'
+SEARCH_MAX_WORDS = 8
+FUZZY_CUTOFF = 0.75
+# Recipe ids stay below this step, so rank * step + id is a unique sort key
+RANK_STEP = 10 ** 12
+# Fields matched by every search word and the rank each match adds
+SEARCH_FIELDS = (
+    ('title', 3),
+    ('tags', 2),
+    ('ingredients', 1),
+)
+
+
+class PrefixSearchQuery(SearchQuery):
+    """ tsquery built with to_tsquery so words can be matched as prefixes"""
+
+    def as_sql(self, compiler, connection):
+        config_sql, config_params = compiler.compile(self.config)
+
+        return (
+            f'to_tsquery({config_sql}::regconfig, %s)',
+            config_params + [self.value],
+        )
+
+
+class TrigramWordSimilar(PostgresSimpleLookup):
+    """ Match fields having a word similar to the value (pg_trgm)"""
+    lookup_name = 'trigram_word_similar'
+    operator = '%%>'
+
+
+CharField.register_lookup(TrigramWordSimilar)
+
+
+def search_words(text):
+    """ Split a search text in lower case words"""
+    return re.findall(r'\w+', text.lower())[:SEARCH_MAX_WORDS]
+
+
+def _prefix_query(word):
+    """ Return a tsquery matching the word as a prefix"""
+    return PrefixSearchQuery(f'{word}:*', config=SEARCH_CONFIG)
+
+
+def _related_matches(field, word, fuzzy):
+    """ Return the through rows linking the outer recipe to tags or
+    ingredients whose name matches the word"""
+    related = Recipe._meta.get_field(field).related_model
+    if fuzzy:
+        names = related.objects.filter(name__trigram_word_similar=word)
+    else:
+        names = related.objects.annotate(
+            name_search=SearchVector('name', config=SEARCH_CONFIG),
+        ).filter(name_search=_prefix_query(word))
+
+    return getattr(Recipe, field).through.objects.filter(**{
+        'recipe_id': OuterRef('pk'),
+        f'{related._meta.model_name}_id__in': names.values('id'),
+    })
+
+
+def _postgres_search(queryset, words, fuzzy=False):
+    """ Match every word against the title, tag and ingredient names
+    through their GIN indexes (tsvector, or pg_trgm when fuzzy)"""
+    annotations = {}
+    if not fuzzy:
+        annotations['title_search'] = SearchVector(
+            'title',
+            config=SEARCH_CONFIG,
+        )
+    matches = Q()
+    rank = Value(0, output_field=BigIntegerField())
+    for index, word in enumerate(words):
+        word_matches = Q()
+        for field, weight in SEARCH_FIELDS:
+            if field == 'title' and fuzzy:
+                condition = Q(title__trigram_word_similar=word)
+            elif field == 'title':
+                condition = Q(title_search=_prefix_query(word))
+            else:
+                name = f'{field}_match_{index}'
+                annotations[name] = Exists(
+                    _related_matches(field, word, fuzzy)
+                )
+                condition = Q(**{name: True})
+            word_matches |= condition
+            rank = rank + Case(
+                When(condition, then=Value(weight)),
+                default=Value(0),
+                output_field=BigIntegerField(),
+            )
+        matches &= word_matches
+
+    return queryset.annotate(**annotations).filter(matches).annotate(
+        search_rank=ExpressionWrapper(
+            rank * Value(RANK_STEP) + F('id'),
+            output_field=BigIntegerField(),
+        ),
+    )
+
+
+def _word_matches(word, tokens, fuzzy):
+    """ Tell whether the word is a prefix of (or, fuzzy, close to) a token"""
+    if any(token.startswith(word) for token in tokens):
+        return True
+
+    return fuzzy and bool(
+        difflib.get_close_matches(word, tokens, n=1, cutoff=FUZZY_CUTOFF)
+    )
+
+
+def _score_documents(documents, words, fuzzy):
+    """ Return the rank of every document matching all the words"""
+    scores = {}
+    for pk, document in documents.items():
+        score = 0
+        for word in words:
+            word_score = sum(
+                weight for field, weight in SEARCH_FIELDS
+                if _word_matches(word, document[field], fuzzy)
+            )
+            if not word_score:
+                break
+            score += word_score
+        else:
+            scores[pk] = score
+
+    return scores
+
+
+def _python_search(queryset, words):
+    """ Rank the recipes in Python, for development databases without
+    text search indexes"""
+    documents = defaultdict(lambda: defaultdict(list))
+    for pk, title in queryset.values_list('id', 'title'):
+        documents[pk]['title'] = search_words(title)
+    for field, _ in SEARCH_FIELDS[1:]:
+        related = Recipe._meta.get_field(field).related_model
+        rows = getattr(Recipe, field).through.objects.filter(
+            recipe_id__in=queryset.values('id'),
+        ).values_list('recipe_id', f'{related._meta.model_name}__name')
+        for pk, name in rows:
+            documents[pk][field].extend(search_words(name))
+
+    scores = (
+        _score_documents(documents, words, fuzzy=False) or
+        _score_documents(documents, words, fuzzy=True)
+    )
+
+    return queryset.filter(id__in=list(scores)).annotate(
+        search_rank=Case(
+            *[
+                When(id=pk, then=Value(score * RANK_STEP + pk))
+                for pk, score in scores.items()
+            ],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        ),
+    )
+
+
+def search_recipes(queryset, text):
+    """ Filter the recipes matching the search text and annotate
+    `search_rank`, a unique key that sorts the best matches first when
+    ordered descending"""
+    words = search_words(text)
+    if not words:
+        return queryset.annotate(
+            search_rank=Value(0, output_field=BigIntegerField()),
+        ).none()
+
+    if connections[queryset.db].vendor != 'postgresql':
+        return _python_search(queryset, words)
+
+    results = _postgres_search(queryset, words)
+    if not results.exists():
+        results = _postgres_search(queryset, words, fuzzy=True)
+
+    return results
@@ -1,11 +1,85 @@
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag
 from core.models import Ingredient
 from core.models import Recipe
+from core.serializers import TimedRepresentationMixin
+
+from recipe.fieldsets import SparseFieldsSerializerMixin
+from recipe.images import variant_names
+from recipe.uploads import release_image
+from recipe.uploads import store_image
+
+
+def image_variant_urls(recipe, request=None):
+    """ Return the URLs of the processed image variants of a recipe"""
+    return variant_urls(recipe.image.name, recipe.image_status, request)
+
+
+def variant_urls(image_name, image_status, request=None):
+    """ Return the URLs of the variants of an image, once processed"""
+    if not image_name or image_status != Recipe.IMAGE_READY:
+        return None
+
+    urls = {}
+    for variant, names in variant_names(image_name).items():
+        urls[variant] = {}
+        for extension, name in names.items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][extension] = url
+
+    return urls
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ Many related field loading every primary key in one query instead
+    of one query per item"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for item in data:
+            try:
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except ValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        objects = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+
+        return [objects[pk] for pk in pks]
 
 
-class TagSerializer(serializers.ModelSerializer):
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Primary key related field validating many=True lists in bulk"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class TagSerializer(TimedRepresentationMixin,
+                    SparseFieldsSerializerMixin,
+                    serializers.ModelSerializer):
     """Serializer for Tag objects"""
 
     class Meta:
@@ -14,7 +88,9 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           SparseFieldsSerializerMixin,
+                           serializers.ModelSerializer):
     """ Serializer for Ingredient Model"""
 
     class Meta:
@@ -23,17 +99,41 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """ Serializer for Tag objects with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """ Serializer for Ingredient Model with the number of recipes using
+    them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+
+
+class RecipeSerializer(TimedRepresentationMixin,
+                       SparseFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """ Serializer for Recipe Model"""
+    expandable_fields = {
+        'ingredients': lambda: IngredientSerializer(many=True, read_only=True),
+        'tags': lambda: TagSerializer(many=True, read_only=True),
+    }
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all(),
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all(),
     )
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -45,20 +145,107 @@ class RecipeSerializer(serializers.ModelSerializer):
             'time_minutes',
             'price',
             'link',
+            'thumbnail',
         )
         read_only_fields = ('id',)
 
+    def get_thumbnail(self, recipe):
+        """ Return the thumbnail URLs, by format, once processed"""
+        urls = image_variant_urls(recipe, self.context.get('request'))
+
+        return urls and urls.get('thumbnail')
+
+    def get_thumbnail_from_values(self, row):
+        """ Return the thumbnail URLs of a values() row"""
+        urls = variant_urls(
+            row['image'],
+            row['image_status'],
+            self.context.get('request'),
+        )
+
+        return urls and urls.get('thumbnail')
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail """
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    images = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'image',
+            'image_status',
+            'images',
+        )
+        read_only_fields = ('id', 'image', 'image_status')
+
+    def get_images(self, recipe):
+        """ Return the URLs of every image variant, once processed"""
+        return image_variant_urls(recipe, self.context.get('request'))
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """ Serializer validating one recipe of a bulk import"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False,
+        default=list,
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False,
+        default=list,
+    )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'title',
+            'ingredients',
+            'tags',
+            'ingredient_names',
+            'tag_names',
+            'time_minutes',
+            'price',
+            'link',
+        )
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
     """ Serializer for uploading images to recipes"""
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status')
+        read_only_fields = ('id', 'image_status')
+
+    def update(self, instance, validated_data):
+        """ Point the recipe to the shared copy of the image content and
+        release the previous image"""
+        previous = instance.image.name
+        with transaction.atomic():
+            name = store_image(validated_data['image'])
+            processed = Recipe.objects.filter(
+                image=name,
+                image_status=Recipe.IMAGE_READY,
+            ).exists()
+            instance.image = name
+            instance.image_status = (
+                Recipe.IMAGE_READY if processed else Recipe.IMAGE_PENDING
+            )
+            instance.save()
+            release_image(previous)
+
+        return instance
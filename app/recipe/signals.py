@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.models import Tag
+from core.models import Ingredient
+from core.models import Recipe
+
+from recipe.cache import bump_data_version
+from recipe.uploads import release_image
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_owner_data_version(sender, instance, **kwargs):
+    """ Invalidate the cached responses of the owner of the object"""
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def bump_user_data_version(sender, instance, **kwargs):
+    """ Start a fresh data version when a user is saved or removed"""
+    bump_data_version(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """ Drop the reference of a deleted recipe on its image"""
+    release_image(instance.image.name)
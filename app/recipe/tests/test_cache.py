@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+
+from recipe.cache import get_data_version
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_recipe_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id, ])
+
+
+def sample_recipe(user, **params):
+    """ Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """ Test the per user response cache of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_cache_hit_skips_database(self):
+        """ Test that a repeated list request does not query the database"""
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(RECIPE_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_detail_cached(self):
+        """ Test that recipe detail responses are cached"""
+        recipe = sample_recipe(user=self.user)
+        self.client.get(detail_recipe_url(recipe.id))
+
+        with self.assertNumQueries(0):
+            res = self.client.get(detail_recipe_url(recipe.id))
+
+        self.assertEqual(res.data['title'], recipe.title)
+
+    def test_write_invalidates_cache(self):
+        """ Test that saving, deleting and linking objects bump the version"""
+        recipe = sample_recipe(user=self.user)
+        versions = {get_data_version(self.user.pk)}
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        versions.add(get_data_version(self.user.pk))
+        recipe.tags.add(tag)
+        versions.add(get_data_version(self.user.pk))
+        recipe.delete()
+        versions.add(get_data_version(self.user.pk))
+
+        self.assertEqual(len(versions), 4)
+
+    def test_new_tag_visible_after_create(self):
+        """ Test that created objects show up in a previously cached list"""
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {'name': 'Dessert'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Dessert'],
+        )
+
+    def test_cache_separated_per_user(self):
+        """ Test that users never see responses cached for someone else"""
+        sample_recipe(user=self.user, title='Mine')
+        self.client.get(RECIPE_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'], [])
@@ -0,0 +1,168 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+
+from recipe.cache import get_cache
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_recipe_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id, ])
+
+
+def sample_recipe(user, **params):
+    """ Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """ Test ETag and Last-Modified handling of the recipe API"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """ Test that a current list is answered from the aggregate only"""
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertIn('ETag', res)
+        self.assertNotIn('Last-Modified', res)
+        get_cache().clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                RECIPE_URL,
+                HTTP_IF_NONE_MATCH=res['ETag'],
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('ETag', res)
+
+    def test_cached_list_not_modified(self):
+        """ Test that revalidating a cached list needs no query"""
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified(self):
+        """ Test that adding an object changes the list ETag"""
+        res = self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_modified_by_deletion(self):
+        """ Test that deleting a recipe is not answered with 304"""
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user, title='Curry')
+        res = self.client.get(RECIPE_URL)
+
+        recipe.delete()
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', res['ETag']),
+            ('HTTP_IF_MODIFIED_SINCE', http_date()),
+        ):
+            with self.subTest(header=header):
+                res = self.client.get(RECIPE_URL, **{header: value})
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(res.data['results']), 1)
+
+    def test_expanded_list_changes_with_nested_tags(self):
+        """ Test that renaming a tag changes the expanded list ETag"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Old')
+        recipe.tags.add(tag)
+        params = {'expand': 'tags'}
+        res = self.client.get(RECIPE_URL, params)
+        plain_etag = self.client.get(RECIPE_URL)['ETag']
+
+        tag.name = 'New'
+        tag.save()
+        res = self.client.get(
+            RECIPE_URL,
+            params,
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'New')
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=plain_etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_if_modified_since(self):
+        """ Test answering If-Modified-Since on recipe detail"""
+        recipe = sample_recipe(user=self.user)
+        url = detail_recipe_url(recipe.id)
+
+        res = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                recipe.updated_at.timestamp() + 1
+            ),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_changes_with_nested_tags(self):
+        """ Test that linking and renaming tags changes the detail ETag"""
+        recipe = sample_recipe(user=self.user)
+        url = detail_recipe_url(recipe.id)
+        etags = {self.client.get(url)['ETag']}
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        etags.add(self.client.get(url)['ETag'])
+        tag.name = 'Vegetarian'
+        tag.save()
+        etags.add(self.client.get(url)['ETag'])
+        tag.delete()
+        etags.add(self.client.get(url)['ETag'])
+
+        self.assertEqual(len(etags), 4)
+
+    def test_m2m_change_touches_recipe(self):
+        """ Test that changing recipe tags updates its timestamp"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        before = Recipe.objects.get(pk=recipe.pk).updated_at
+
+        tag.recipe_set.add(recipe)
+
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, before)
+
+    def test_detail_not_found(self):
+        """ Test that missing recipes still return 404"""
+        res = self.client.get(detail_recipe_url(999))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
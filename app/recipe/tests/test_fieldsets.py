@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.models import Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_recipe_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def recipe_selects(queries):
+    """ Return the SQL of the captured queries loading recipes"""
+    return [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].startswith('SELECT "core_recipe"."id"')
+    ]
+
+
+class RecipeFieldsetTests(TestCase):
+    """ Test narrowing and expanding the recipe representation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=30,
+            price='8.00',
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.salt)
+
+    def test_list_fields(self):
+        """ Test listing only the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, {
+                'fields': 'id,title,time_minutes',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{
+            'id': self.recipe.id,
+            'title': 'Curry',
+            'time_minutes': 30,
+        }])
+        sql, = recipe_selects(queries)
+        self.assertNotIn('"price"', sql)
+        self.assertNotIn('"link"', sql)
+        self.assertFalse(any(
+            'core_recipe_tags' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_list_expand(self):
+        """ Test nesting the tags and ingredients of listed recipes"""
+        res = self.client.get(RECIPE_URL, {'expand': 'tags,ingredients'})
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tags'], [{'id': self.tag.id,
+                                           'name': 'Vegan'}])
+        self.assertEqual(recipe['ingredients'], [{'id': self.salt.id,
+                                                  'name': 'Salt'}])
+        self.assertEqual(recipe['title'], 'Curry')
+
+    def test_fields_and_expand(self):
+        """ Test that expanded fields are listed with the selected ones"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id', 'expand': 'tags'})
+
+        self.assertEqual(res.data['results'], [{
+            'id': self.recipe.id,
+            'tags': [{'id': self.tag.id, 'name': 'Vegan'}],
+        }])
+
+    def test_thumbnail_field_loads_image_columns(self):
+        """ Test that a computed field loads the columns it reads"""
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL, {'fields': 'id,thumbnail'})
+
+        self.assertEqual(res.data['results'], [{
+            'id': self.recipe.id,
+            'thumbnail': None,
+        }])
+
+    def test_detail_fields(self):
+        """ Test narrowing the recipe detail"""
+        res = self.client.get(detail_recipe_url(self.recipe.id), {
+            'fields': 'title,ingredients',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'title': 'Curry',
+            'ingredients': [{'id': self.salt.id, 'name': 'Salt'}],
+        })
+
+    def test_invalid_fieldset(self):
+        """ Test that unknown fields and expansions are rejected"""
+        for params in ({'fields': 'id,user'}, {'fields': ','},
+                       {'expand': 'price'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fields_ignored_on_write(self):
+        """ Test that writes validate and return every field"""
+        res = self.client.post(f'{RECIPE_URL}?fields=id', {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '4.00',
+            'tags': [self.tag.id],
+            'ingredients': [],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['title'], 'Soup')
+        self.assertEqual(res.data['tags'], [self.tag.id])
+
+
+class TagFieldsetTests(TestCase):
+    """ Test narrowing the tag representation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        for name in ('Dinner', 'Lunch', 'Vegan'):
+            Tag.objects.create(user=self.user, name=name)
+
+    def test_tag_fields_paginated(self):
+        """ Test that cursors still work when the ordering is not listed"""
+        res = self.client.get(TAGS_URL, {'fields': 'id', 'page_size': 2})
+
+        self.assertEqual(list(res.data['results'][0]), ['id'])
+        with self.assertNumQueries(2):
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tag_fields_with_counts(self):
+        """ Test selecting the recipe count of the tag facets"""
+        res = self.client.get(TAGS_URL, {
+            'fields': 'name,recipe_count',
+            'with_counts': 1,
+        })
+
+        self.assertEqual(res.data['results'][0], {
+            'name': 'Vegan',
+            'recipe_count': 0,
+        })
+
+    def test_tag_cannot_expand(self):
+        """ Test that tags have nothing to expand"""
+        res = self.client.get(TAGS_URL, {'expand': 'recipes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,205 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe.images import process_recipe_image
+from recipe.images import variant_names
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+MEDIA_ROOT = tempfile.mkdtemp()
+EXIF_ORIENTATION = 0x0112
+
+
+def image_content(size=(1000, 500), format='PNG', mode='RGB',
+                  color='red', **options):
+    """ Return an encoded image of the given size"""
+    buffer = io.BytesIO()
+    Image.new(mode, size, color=color).save(buffer, format=format, **options)
+
+    return ContentFile(buffer.getvalue(), name=f'photo.{format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImageProcessingTests(TestCase):
+    """ Test building the variants of uploaded recipe images"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=5.00,
+        )
+
+    def _add_image(self, content=None):
+        """ Store an image on the recipe, as the upload does"""
+        self.recipe.image.save('photo.png', content or image_content())
+        self.recipe.image_status = Recipe.IMAGE_PENDING
+        self.recipe.save()
+
+    def test_upload_schedules_processing(self):
+        """ Test that the upload returns before the variants are built"""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+        with patch('recipe.views.schedule_image_processing') as schedule:
+            res = self.client.post(
+                url,
+                {'image': image_content(format='JPEG')},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        schedule.assert_called_once_with(self.recipe)
+
+    def test_process_creates_variants(self):
+        """ Test resizing the image to JPEG and WebP variants"""
+        self._add_image()
+
+        process_recipe_image(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        names = variant_names(self.recipe.image.name)
+        for variant, size in (('thumbnail', 200), ('medium', 800)):
+            for extension, format in (('jpeg', 'JPEG'), ('webp', 'WEBP')):
+                with default_storage.open(names[variant][extension]) as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.format, format)
+                    self.assertEqual(image.size, (size, size // 2))
+
+    def _open_variant(self, variant, extension):
+        """ Return the decoded variant of the recipe image"""
+        name = variant_names(self.recipe.image.name)[variant][extension]
+        with default_storage.open(name) as f:
+            image = Image.open(f)
+            image.load()
+
+        return image
+
+    def test_process_applies_exif_orientation(self):
+        """ Test that variants are turned upright by their EXIF tag"""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        self._add_image(image_content(format='JPEG', exif=exif.tobytes()))
+
+        process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        self.assertEqual(self._open_variant('thumbnail', 'webp').size,
+                         (100, 200))
+        self.assertEqual(self._open_variant('medium', 'jpeg').size,
+                         (400, 800))
+
+    def test_process_transparent_image(self):
+        """ Test that WebP variants keep the transparency and JPEG ones
+        are flattened on white"""
+        self._add_image(image_content(mode='RGBA', color=(255, 0, 0, 0)))
+
+        process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        webp = self._open_variant('thumbnail', 'webp')
+        self.assertEqual(webp.mode, 'RGBA')
+        self.assertEqual(webp.getpixel((0, 0))[3], 0)
+        jpeg = self._open_variant('thumbnail', 'jpeg')
+        self.assertEqual(jpeg.mode, 'RGB')
+        self.assertTrue(all(value > 250 for value in jpeg.getpixel((0, 0))))
+
+    def test_process_pending_images_command(self):
+        """ Test that images whose job was lost are processed again,
+        leaving the recent uploads to their job"""
+        self._add_image()
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+        recent = Recipe.objects.create(
+            user=self.user,
+            title='Recent recipe',
+            time_minutes=10,
+            price=5.00,
+            image=self.recipe.image.name,
+            image_status=Recipe.IMAGE_PENDING,
+        )
+
+        call_command('process_pending_images', stdout=StringIO())
+        self.recipe.refresh_from_db()
+        recent.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(recent.image_status, Recipe.IMAGE_PENDING)
+
+    def test_process_invalid_image(self):
+        """ Test that undecodable images are marked as failed"""
+        self._add_image(ContentFile(b'not an image'))
+
+        with self.assertLogs('recipe.images', 'ERROR'):
+            process_recipe_image(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_process_replaced_image(self):
+        """ Test that a stale job leaves the new image untouched"""
+        self._add_image()
+        stale = self.recipe.image.name
+        self._add_image()
+
+        process_recipe_image(self.recipe.id, stale)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+        thumbnail = variant_names(stale)['thumbnail']['webp']
+        self.assertFalse(default_storage.exists(thumbnail))
+
+    def test_list_exposes_thumbnail_only(self):
+        """ Test that lists ship the thumbnail and details every variant"""
+        self._add_image()
+        res = self.client.get(RECIPES_URL)
+        self.assertIsNone(res.data['results'][0]['thumbnail'])
+
+        process_recipe_image(self.recipe.id, self.recipe.image.name)
+        res = self.client.get(RECIPES_URL)
+        detail = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+        )
+
+        thumbnail = res.data['results'][0]['thumbnail']
+        self.assertEqual(set(thumbnail), {'jpeg', 'webp'})
+        self.assertTrue(thumbnail['webp'].startswith('http://testserver/'))
+        self.assertTrue(thumbnail['webp'].endswith('_thumbnail.webp'))
+        self.assertNotIn('images', res.data['results'][0])
+        self.assertEqual(
+            set(detail.data['images']),
+            {'thumbnail', 'medium'},
+        )
@@ -6,6 +6,8 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Ingredient
+from core.models import Recipe
+from core.testing import QueryBudgetMixin
 
 from recipe.serializers import IngredientSerializer
 
@@ -27,7 +29,7 @@ class PublicIngredientsAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientsAPITest(TestCase):
+class PrivateIngredientsAPITest(QueryBudgetMixin, TestCase):
     """ Test private Ingredients API"""
 
     def setUp(self):
@@ -54,7 +56,7 @@ class PrivateIngredientsAPITest(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_ingredients_limited_to_user(self):
@@ -82,7 +84,7 @@ class PrivateIngredientsAPITest(TestCase):
             user=self.user).order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_create_ingredient_successful(self):
@@ -108,3 +110,70 @@ class PrivateIngredientsAPITest(TestCase):
         res = self.client.post(INGREDIENTS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ingredients_with_counts(self):
+        """Test listing ingredients with the number of recipes using them"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=5,
+        )
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL, {'with_counts': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['recipe_count'])
+             for item in res.data['results']],
+            [('Salt', 1), ('Pepper', 0)],
+        )
+
+    def _create_ingredients(self, count):
+        """ Create ingredients used by a recipe each"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=5,
+        )
+        start = Ingredient.objects.count()
+        for i in range(start, start + count):
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'I{i}'),
+            )
+
+    def test_ingredients_query_budget(self):
+        """ Test the ingredient list budget with 1 and 100 ingredients"""
+        responses = self.assertQueryBudgetAtSizes(
+            2,
+            self._create_ingredients,
+            lambda: self.client.get(INGREDIENTS_URL),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_ingredients_facets_query_budget(self):
+        """ Test the ingredient facets budget with 1 and 100 ingredients"""
+        responses = self.assertQueryBudgetAtSizes(
+            3,
+            self._create_ingredients,
+            lambda: self.client.get(INGREDIENTS_URL, {
+                'with_counts': 1,
+                'assigned_only': 1,
+            }),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_create_ingredient_query_budget(self):
+        """ Test the ingredient creation budget with 1 and 100 existing
+        ingredients"""
+        self.assertQueryBudgetAtSizes(
+            1,
+            self._create_ingredients,
+            lambda: self.client.post(INGREDIENTS_URL, {'name': 'New'}),
+        )
@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe.images import variant_name
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(name):
+    """ Return the URL serving a stored file"""
+    return reverse('media', args=[name])
+
+
+def content(response):
+    """ Return the body of a streamed response"""
+    body = b''.join(response.streaming_content)
+    response.close()
+
+    return body
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaViewTests(TestCase):
+    """ Test serving recipe images to their owner"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=5.00,
+        )
+        self.recipe.image.save('photo.jpg', ContentFile(CONTENT))
+        self.name = self.recipe.image.name
+
+    def test_login_required(self):
+        """ Test that anonymous requests are refused"""
+        res = APIClient().get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_user_not_found(self):
+        """ Test that images of other users are hidden"""
+        other = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_path_outside_media_root(self):
+        """ Test that paths escaping the media root are not served"""
+        res = self.client.get('/media/../manage.py')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serve_file(self):
+        """ Test serving the whole file with caching headers"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(content(res), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertTrue(res['ETag'].startswith('"'))
+
+    def test_serve_variant(self):
+        """ Test that variants are served to the owner of the original"""
+        name = variant_name(self.name, 'thumbnail', 'webp')
+        os.makedirs(os.path.dirname(os.path.join(MEDIA_ROOT, name)))
+        with open(os.path.join(MEDIA_ROOT, name), 'wb') as variant:
+            variant.write(b'variant')
+
+        res = self.client.get(media_url(name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(content(res), b'variant')
+
+    def test_not_modified(self):
+        """ Test that a matching ETag returns 304"""
+        etag = self.client.get(media_url(self.name))['ETag']
+
+        res = self.client.get(media_url(self.name), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range(self):
+        """ Test serving byte ranges"""
+        for header, start, end in (('bytes=10-19', 10, 19),
+                                   ('bytes=1000-', 1000, 1023),
+                                   ('bytes=-4', 1020, 1023),
+                                   ('bytes=1020-5000', 1020, 1023)):
+            res = self.client.get(media_url(self.name), HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(content(res), CONTENT[start:end + 1])
+            self.assertEqual(res['Content-Length'], str(end - start + 1))
+            self.assertEqual(
+                res['Content-Range'],
+                f'bytes {start}-{end}/{len(CONTENT)}',
+            )
+
+    def test_range_not_satisfiable(self):
+        """ Test that ranges past the end of the file return 416"""
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=2000-')
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_if_range_mismatch(self):
+        """ Test that a stale If-Range sends the whole file"""
+        res = self.client.get(
+            media_url(self.name),
+            HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE='"stale"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(content(res), CONTENT)
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        """ Test handing the transfer off to the web server"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(MEDIA_ROOT, self.name),
+        )
+        self.assertEqual(res.content, b'')
+
+    @override_settings(
+        MEDIA_OFFLOAD='x-accel-redirect',
+        MEDIA_ACCEL_REDIRECT_PREFIX='/internal/',
+    )
+    def test_x_accel_redirect(self):
+        """ Test handing the transfer off to nginx"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res['X-Accel-Redirect'], f'/internal/{self.name}')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
@@ -1,11 +1,15 @@
+import csv
+import io
 import tempfile
 import os
+import json
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.test import skipUnlessDBFeature
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -13,13 +17,19 @@ from rest_framework.test import APIClient
 from core.models import Recipe
 from core.models import Tag
 from core.models import Ingredient
+from core.testing import QueryBudgetMixin
 
 from recipe.serializers import RecipeSerializer
 from recipe.serializers import RecipeDetailSerializer
+from recipe.export import iter_ndjson
+from recipe.export import split_names
 from decimal import Decimal
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+BATCH_URL = reverse('recipe:recipe-batch')
 
 
 def image_upload_url(recipe_id):
@@ -92,7 +102,7 @@ class PrivateRecipeAPItest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retriving_limited_to_user_recipes(self):
         """Test retirving a list of recipes"""
@@ -110,7 +120,7 @@ class PrivateRecipeAPItest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """ Test viewing recipe detail view"""
@@ -286,9 +296,9 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -312,6 +322,485 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+class RecipeQueryCountTests(QueryBudgetMixin, TestCase):
+    """ Test that recipe endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """ Create recipes with a tag and an ingredient each"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        for i in range(count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        return recipe
+
+    def test_list_recipes_query_count(self):
+        """ Test listing recipes does not issue a query per recipe"""
+        self._create_recipes(1)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+        self._create_recipes(50)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 51)
+
+    def test_retrieve_recipe_query_count(self):
+        """ Test recipe detail loads nested tags and ingredients in bulk"""
+        recipe = self._create_recipes(1)
+        for i in range(10):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_recipe_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 11)
+
+    def test_list_recipes_query_budget(self):
+        """ Test the recipe list budget with 1 and 100 recipes"""
+        responses = self.assertQueryBudgetAtSizes(
+            4,
+            self._create_recipes,
+            lambda: self.client.get(RECIPE_URL),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_filter_recipes_query_budget(self):
+        """ Test the filtered recipe list budget with 1 and 100 recipes"""
+        tag = sample_tag(user=self.user, name='Vegan')
+
+        def create_rows(count):
+            for i in range(count):
+                sample_recipe(user=self.user).tags.add(tag)
+
+        responses = self.assertQueryBudgetAtSizes(
+            4,
+            create_rows,
+            lambda: self.client.get(RECIPE_URL, {
+                'tags': f'{tag.id}',
+                'max_price': '10',
+            }),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_retrieve_recipe_query_budget(self):
+        """ Test the recipe detail budget with 1 and 100 tags and
+        ingredients"""
+        recipe = sample_recipe(user=self.user)
+
+        def create_rows(count):
+            for i in range(count):
+                recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+                recipe.ingredients.add(
+                    sample_ingredient(user=self.user, name=f'Salt {i}'),
+                )
+
+        responses = self.assertQueryBudgetAtSizes(
+            4,
+            create_rows,
+            lambda: self.client.get(detail_recipe_url(recipe.id)),
+        )
+
+        self.assertEqual(len(responses[100].data['tags']), 100)
+        self.assertEqual(len(responses[100].data['ingredients']), 100)
+
+    def test_create_recipe_query_budget(self):
+        """ Test the recipe creation budget with 1 and 100 tags and
+        ingredients"""
+        tags, ingredients = [], []
+
+        def create_rows(count):
+            for i in range(count):
+                tags.append(sample_tag(user=self.user, name=f'Tag {i}').id)
+                ingredients.append(
+                    sample_ingredient(user=self.user, name=f'Salt {i}').id,
+                )
+
+        responses = self.assertQueryBudgetAtSizes(
+            13,
+            create_rows,
+            lambda: self.client.post(RECIPE_URL, {
+                'title': 'Curry',
+                'time_minutes': 30,
+                'price': '8.00',
+                'tags': tags,
+                'ingredients': ingredients,
+            }, format='json'),
+        )
+
+        recipe = Recipe.objects.get(id=responses[100].data['id'])
+        self.assertEqual(recipe.tags.count(), 100)
+        self.assertEqual(recipe.ingredients.count(), 100)
+
+    def test_update_recipe_query_budget(self):
+        """ Test the recipe update budget with 1 and 100 tags"""
+        recipe = sample_recipe(user=self.user)
+        tags = []
+
+        def create_rows(count):
+            for i in range(count):
+                tags.append(sample_tag(user=self.user, name=f'Tag {i}').id)
+
+        self.assertQueryBudgetAtSizes(
+            9,
+            create_rows,
+            lambda: self.client.patch(
+                detail_recipe_url(recipe.id),
+                {'tags': tags},
+                format='json',
+            ),
+        )
+
+        self.assertEqual(recipe.tags.count(), 100)
+
+    def test_create_recipe_unknown_tag(self):
+        """ Test that tags are validated in bulk but still one by one"""
+        tag = sample_tag(user=self.user)
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '8.00',
+            'tags': [tag.id, tag.id + 1],
+            'ingredients': ['salt'],
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['tags'],
+            [f'Invalid pk "{tag.id + 1}" - object does not exist.'],
+        )
+        self.assertEqual(
+            res.data['ingredients'],
+            ['Incorrect type. Expected pk value, received str.'],
+        )
+
+    def test_batch_recipes_query_budget(self):
+        """ Test the batch budget with 1 and 100 recipes"""
+        self.assertQueryBudgetAtSizes(
+            4,
+            self._create_recipes,
+            lambda: self.client.get(BATCH_URL, {'ids': ','.join(
+                str(pk) for pk in Recipe.objects.values_list('id', flat=True)
+            )}),
+        )
+
+    def test_list_recipes_page_query_count(self):
+        """ Test that deep pages cost the same as the first page"""
+        self._create_recipes(30)
+
+        res = self.client.get(RECIPE_URL, {'page_size': 10})
+        self.assertEqual(len(res.data['results']), 10)
+        next_url = self.client.get(res.data['next']).data['next']
+
+        with self.assertNumQueries(4):
+            res = self.client.get(next_url)
+
+        self.assertEqual(len(res.data['results']), 10)
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(res.data['results'][-1]['title'], 'Recipe 0')
+
+
+class RecipeExportTests(TestCase):
+    """ Test streaming the recipe catalogue of a user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_export_ndjson(self):
+        """ Test exporting recipes as newline delimited JSON"""
+        recipe = sample_recipe(user=self.user, title='Pizza')
+        recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass',
+        )
+        sample_recipe(user=user2, title='Foreign')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {
+            'id': recipe.id,
+            'title': 'Pizza',
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': '',
+            'tags': ['Vegan'],
+            'ingredients': ['salt'],
+        })
+
+    def test_export_csv(self):
+        """ Test exporting recipes as CSV"""
+        recipe = sample_recipe(user=self.user, title='Pizza')
+        recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+        recipe.tags.add(sample_tag(user=self.user, name='Dinner'))
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0],
+            'id,title,time_minutes,price,link,tags,ingredients',
+        )
+        self.assertEqual(lines[1], f'{recipe.id},Pizza,10,5.00,,Dinner|Vegan,')
+
+    def test_export_csv_escapes_separator(self):
+        """ Test that names holding the separator are read back whole"""
+        recipe = sample_recipe(user=self.user, title='Pizza')
+        names = ['x|y', 'x', 'back\\slash|']
+        for name in names:
+            recipe.tags.add(sample_tag(user=self.user, name=name))
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        content = b''.join(res.streaming_content).decode()
+        row = list(csv.DictReader(io.StringIO(content)))[0]
+        self.assertEqual(row['tags'], 'back\\\\slash\\||x|x\\|y')
+        self.assertEqual(split_names(row['tags']), sorted(names))
+        self.assertEqual(split_names(row['ingredients']), [])
+
+    def test_export_invalid_type(self):
+        """ Test that unknown export types are rejected"""
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_queries_per_chunk(self):
+        """ Test that names are loaded once per chunk, not per recipe"""
+        tag = sample_tag(user=self.user)
+        for i in range(5):
+            sample_recipe(user=self.user, title=f'Recipe {i}').tags.add(tag)
+        queryset = Recipe.objects.filter(user=self.user).order_by('id')
+
+        with self.assertNumQueries(7):
+            lines = list(iter_ndjson(queryset, chunk_size=2))
+
+        self.assertEqual(len(lines), 5)
+
+
+class RecipeImportTests(TestCase):
+    """ Test importing many recipes at once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_import_recipes(self):
+        """ Test importing recipes linked by id and by name"""
+        tag = sample_tag(user=self.user, name='Vegan')
+        ingredient = sample_ingredient(user=self.user, name='Salt')
+        payload = [
+            {
+                'title': 'Salad',
+                'time_minutes': 5,
+                'price': '3.50',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+            },
+            {
+                'title': 'Soup',
+                'time_minutes': 30,
+                'price': '4.00',
+                'tag_names': ['Vegan', 'Winter'],
+                'ingredient_names': ['Carrot'],
+            },
+        ]
+
+        res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['errors'], [])
+        self.assertEqual(len(res.data['created']), 2)
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(list(salad.tags.all()), [tag])
+        self.assertEqual(list(salad.ingredients.all()), [ingredient])
+        soup = Recipe.objects.get(title='Soup')
+        self.assertEqual(
+            sorted(soup.tags.values_list('name', flat=True)),
+            ['Vegan', 'Winter'],
+        )
+        self.assertIn(tag, soup.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            list(soup.ingredients.values_list('name', flat=True)),
+            ['Carrot'],
+        )
+
+    def test_import_reports_item_errors(self):
+        """ Test invalid items are reported without blocking valid ones"""
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass',
+        )
+        foreign_tag = sample_tag(user=user2)
+        payload = {'recipes': [
+            {'title': 'Valid', 'time_minutes': 5, 'price': '1.00'},
+            {'title': 'No price', 'time_minutes': 5},
+            {
+                'title': 'Foreign tag',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': [foreign_tag.id],
+            },
+        ]}
+
+        res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['created']), 1)
+        self.assertEqual(
+            [error['index'] for error in res.data['errors']],
+            [1, 2],
+        )
+        self.assertIn('price', res.data['errors'][0]['errors'])
+        self.assertIn('tags', res.data['errors'][1]['errors'])
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Valid'],
+        )
+
+    def test_import_invalid_payload(self):
+        """ Test that a payload without a list of recipes is rejected"""
+        res = self.client.post(IMPORT_URL, {'title': 'x'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnlessDBFeature('can_return_ids_from_bulk_insert')
+    def test_import_query_count(self):
+        """ Test that importing does not issue queries per recipe"""
+        tag = sample_tag(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': [tag.id],
+                'tag_names': ['Imported'],
+            }
+            for i in range(100)
+        ]
+
+        with self.assertNumQueries(7):
+            res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(len(res.data['created']), 100)
+
+
+class RecipeBatchTests(TestCase):
+    """ Test fetching many recipes by id at once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_batch_recipes(self):
+        """ Test that recipes are returned in the requested order"""
+        first = sample_recipe(user=self.user, title='Curry')
+        first.tags.add(sample_tag(user=self.user))
+        first.ingredients.add(sample_ingredient(user=self.user))
+        second = sample_recipe(user=self.user, title='Soup')
+
+        res = self.client.get(BATCH_URL, {
+            'ids': f'{second.id},{first.id},{second.id}',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['errors'], [])
+        self.assertEqual(
+            res.data['results'],
+            [self.client.get(detail_recipe_url(pk)).data
+             for pk in (second.id, first.id)],
+        )
+
+    def test_batch_reports_missing_recipes(self):
+        """ Test that missing and foreign ids are reported alike"""
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'password123',
+        )
+        foreign = sample_recipe(user=user2)
+        recipe = sample_recipe(user=self.user)
+        missing = foreign.id + 100
+
+        res = self.client.get(BATCH_URL, {
+            'ids': f'{foreign.id},{recipe.id},{missing}',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [recipe.id],
+        )
+        self.assertEqual(res.data['errors'], [
+            {'id': foreign.id, 'detail': 'Not found.'},
+            {'id': missing, 'detail': 'Not found.'},
+        ])
+
+    def test_batch_sparse_fields(self):
+        """ Test that the fields parameter applies to every recipe"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(BATCH_URL, {
+            'ids': recipe.id,
+            'fields': 'id,title',
+        })
+
+        self.assertEqual(res.data['results'], [
+            {'id': recipe.id, 'title': recipe.title},
+        ])
+
+    def test_batch_invalid_ids(self):
+        """ Test that missing, malformed and too many ids are rejected"""
+        too_many = ','.join(str(pk) for pk in range(1, 102))
+        for params in ({}, {'ids': ''}, {'ids': '1,a'}, {'ids': too_many},
+                       {'ids': '0'}, {'ids': '1,-2'},
+                       {'ids': '99999999999999999999'}):
+            with self.subTest(params=params):
+                res = self.client.get(BATCH_URL, params)
+
+                self.assertEqual(
+                    res.status_code,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+                self.assertIn('ids', res.data)
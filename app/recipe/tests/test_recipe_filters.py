@@ -0,0 +1,215 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.models import Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """ Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeRangeFilterTests(TestCase):
+    """ Test filtering and ordering recipes by price and time"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        sample_recipe(user=self.user, title='Quick', time_minutes=15,
+                      price='8.00')
+        sample_recipe(user=self.user, title='Cheap', time_minutes=45,
+                      price='4.50')
+        sample_recipe(user=self.user, title='Fancy', time_minutes=25,
+                      price='30.00')
+        sample_recipe(user=self.user, title='Slow', time_minutes=120,
+                      price='12.00')
+
+    def _titles(self, **params):
+        """ Return the listed titles for the query parameters"""
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_filter_max_time_and_price(self):
+        """ Test the under 30 minutes and under $10 query"""
+        self.assertEqual(self._titles(max_time=30, max_price=10), ['Quick'])
+
+    def test_filter_min_values(self):
+        """ Test the lower bounds are inclusive"""
+        self.assertEqual(
+            self._titles(min_time=45, min_price='4.50', ordering='price'),
+            ['Cheap', 'Slow'],
+        )
+
+    def test_ordering(self):
+        """ Test ordering by price and by time"""
+        self.assertEqual(
+            self._titles(ordering='price'),
+            ['Cheap', 'Quick', 'Slow', 'Fancy'],
+        )
+        self.assertEqual(
+            self._titles(ordering='-time_minutes'),
+            ['Slow', 'Cheap', 'Fancy', 'Quick'],
+        )
+
+    def test_invalid_parameters(self):
+        """ Test that invalid numbers and orderings are rejected"""
+        for params in ({'max_price': 'cheap'}, {'min_time': '1.5'},
+                       {'ordering': 'title'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_ids(self):
+        """ Test that ids the primary key cannot hold are rejected"""
+        for name in ('tags', 'ingredients'):
+            for value in ('99999999999999999999', '0', '1,-2'):
+                with self.subTest(name=name, value=value):
+                    res = self.client.get(RECIPE_URL, {name: value})
+
+                    self.assertEqual(
+                        res.status_code,
+                        status.HTTP_400_BAD_REQUEST,
+                    )
+                    self.assertIn(name, res.data)
+
+    def test_out_of_range_parameters(self):
+        """ Test that unbounded and non-finite numbers are rejected"""
+        for name, value in (
+            ('max_time', '99999999999999999999'),
+            ('min_time', '-1'),
+            ('max_price', 'NaN'),
+            ('max_price', 'Infinity'),
+            ('max_price', '1e10'),
+            ('min_price', '-1e400'),
+            ('min_price', '4.555'),
+        ):
+            with self.subTest(name=name, value=value):
+                res = self.client.get(RECIPE_URL, {name: value})
+
+                self.assertEqual(
+                    res.status_code,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+                self.assertIn(name, res.data)
+
+    def test_ordering_pages_through_ties(self):
+        """ Test that equal prices are paged without losing recipes"""
+        for i in range(5):
+            sample_recipe(user=self.user, title=f'Same {i}', price='6.00')
+
+        res = self.client.get(RECIPE_URL, {
+            'ordering': 'price',
+            'max_price': '6.00',
+            'page_size': 2,
+        })
+        titles = [recipe['title'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            titles.extend(recipe['title'] for recipe in res.data['results'])
+
+        self.assertEqual(
+            titles,
+            ['Cheap', 'Same 0', 'Same 1', 'Same 2', 'Same 3', 'Same 4'],
+        )
+
+        previous = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [recipe['title'] for recipe in previous.data['results']],
+            ['Same 1', 'Same 2'],
+        )
+
+
+class RecipeRelatedFilterTests(TestCase):
+    """ Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.both = sample_recipe(user=self.user, title='Both')
+        self.both.tags.add(self.vegan, self.dinner)
+        self.both.ingredients.add(self.salt)
+        self.vegan_only = sample_recipe(user=self.user, title='Vegan only')
+        self.vegan_only.tags.add(self.vegan)
+        sample_recipe(user=self.user, title='None')
+
+    def _titles(self, **params):
+        """ Return the listed titles for the query parameters"""
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_filter_any_tag_without_duplicates(self):
+        """ Test that recipes matching several tags are listed once"""
+        self.assertEqual(
+            self._titles(tags=f'{self.vegan.id},{self.dinner.id}'),
+            ['Vegan only', 'Both'],
+        )
+
+    def test_filter_all_tags(self):
+        """ Test match=all returns recipes having every listed tag"""
+        self.assertEqual(
+            self._titles(tags=f'{self.vegan.id},{self.dinner.id}',
+                         match='all'),
+            ['Both'],
+        )
+        self.assertEqual(
+            self._titles(tags=f'{self.vegan.id},{self.vegan.id}',
+                         match='all'),
+            ['Vegan only', 'Both'],
+        )
+
+    def test_filter_tags_and_ingredients(self):
+        """ Test combining tag and ingredient filters"""
+        self.assertEqual(
+            self._titles(tags=f'{self.vegan.id}',
+                         ingredients=f'{self.salt.id}'),
+            ['Both'],
+        )
+
+    def test_filter_query_uses_semi_join(self):
+        """ Test that the filter does not join or DISTINCT the recipes"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPE_URL, {'tags': f'{self.vegan.id}'})
+
+        sql = queries.captured_queries[-3]['sql']
+        self.assertIn('IN (SELECT', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_invalid_filters(self):
+        """ Test that malformed id lists and match modes are rejected"""
+        for params in ({'tags': 'a,b'}, {'ingredients': '1,'},
+                       {'tags': '1', 'match': 'some'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
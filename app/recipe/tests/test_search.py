@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.models import Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """ Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """ Test searching recipes by title, tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.curry = sample_recipe(user=self.user, title='Chicken Curry')
+        self.salad = sample_recipe(user=self.user, title='Green Salad')
+        self.soup = sample_recipe(user=self.user, title='Noodle Soup')
+        self.salad.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.soup.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Chicken broth'),
+        )
+
+    def _search(self, text, **params):
+        """ Return the titles found for the search text"""
+        res = self.client.get(RECIPE_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_title_prefix(self):
+        """ Test matching the beginning of title words"""
+        self.assertEqual(self._search('sal'), ['Green Salad'])
+
+    def test_search_tag_and_ingredient_names(self):
+        """ Test matching tag and ingredient names"""
+        self.assertEqual(self._search('vegan'), ['Green Salad'])
+        self.assertEqual(self._search('broth'), ['Noodle Soup'])
+
+    def test_search_ranking(self):
+        """ Test that title matches rank above ingredient matches"""
+        self.assertEqual(
+            self._search('chicken'),
+            ['Chicken Curry', 'Noodle Soup'],
+        )
+
+    def test_search_all_words_across_fields(self):
+        """ Test that every word must match one of the fields"""
+        self.assertEqual(self._search('noodle chicken'), ['Noodle Soup'])
+        self.assertEqual(self._search('noodle vegan'), [])
+
+    def test_search_typo_fallback(self):
+        """ Test that misspelled words fall back to fuzzy matching"""
+        self.assertEqual(
+            self._search('chiken'),
+            ['Chicken Curry', 'Noodle Soup'],
+        )
+
+    def test_search_limited_to_user(self):
+        """ Test that recipes of other users are not found"""
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass',
+        )
+        sample_recipe(user=user2, title='Salad Nicoise')
+
+        self.assertEqual(self._search('salad'), ['Green Salad'])
+
+    def test_search_paginated(self):
+        """ Test walking ranked results with the cursor"""
+        for i in range(4):
+            sample_recipe(user=self.user, title=f'Pasta {i}')
+
+        res = self.client.get(RECIPE_URL, {'search': 'pasta', 'page_size': 3})
+        titles = [recipe['title'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        titles += [recipe['title'] for recipe in res.data['results']]
+
+        self.assertEqual(titles, ['Pasta 3', 'Pasta 2', 'Pasta 1', 'Pasta 0'])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_without_words(self):
+        """ Test that a search without words finds nothing"""
+        self.assertEqual(self._search('!!'), [])
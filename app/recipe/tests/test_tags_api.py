@@ -1,11 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag
+from core.models import Recipe
+from core.testing import QueryBudgetMixin
 
 from recipe.serializers import TagSerializer
 
@@ -26,7 +30,7 @@ class PublicTagsApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsAPITests(TestCase):
+class PrivateTagsAPITests(QueryBudgetMixin, TestCase):
     """ Test the authorized users API """
 
     def setUp(self):
@@ -48,7 +52,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that the tags returned are assing to authenticated user"""
@@ -59,13 +63,13 @@ class PrivateTagsAPITests(TestCase):
         Tag.objects.create(user=user2, name='meet')
         Tag.objects.create(user=self.user, name='fruit')
         Tag.objects.create(user=self.user, name='vegetables')
-        tags = Tag.objects.filter(user=self.user)
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
 
         res = self.client.get(TAGS_URLS)
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_create_tag_successful(self):
         """ Test creating a new Tag"""
@@ -87,3 +91,179 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.post(TAGS_URLS, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _create_tags(self, count):
+        """ Create tags used by a recipe each"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=5,
+        )
+        start = Tag.objects.count()
+        for i in range(start, start + count):
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+
+    def test_tags_query_budget(self):
+        """ Test the tag list budget with 1 and 100 tags"""
+        responses = self.assertQueryBudgetAtSizes(
+            2,
+            self._create_tags,
+            lambda: self.client.get(TAGS_URLS),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_tags_facets_query_budget(self):
+        """ Test the tag facets budget with 1 and 100 tags"""
+        responses = self.assertQueryBudgetAtSizes(
+            3,
+            self._create_tags,
+            lambda: self.client.get(TAGS_URLS, {
+                'with_counts': 1,
+                'assigned_only': 1,
+            }),
+        )
+
+        self.assertEqual(len(responses[100].data['results']), 100)
+
+    def test_create_tag_query_budget(self):
+        """ Test the tag creation budget with 1 and 100 existing tags"""
+        self.assertQueryBudgetAtSizes(
+            1,
+            self._create_tags,
+            lambda: self.client.post(TAGS_URLS, {'name': 'New'}),
+        )
+
+    def test_tags_paginated_by_cursor(self):
+        """Test walking the tag list page by page with the cursor"""
+        for name in ('apple', 'banana', 'banana', 'cherry', 'date'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URLS, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            names.extend(tag['name'] for tag in res.data['results'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            names,
+            ['date', 'cherry', 'banana', 'banana', 'apple'],
+        )
+
+    def test_tags_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        res = self.client.get(TAGS_URLS, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TagFacetTests(TestCase):
+    """ Test listing tags with the number of recipes using them"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.unused = Tag.objects.create(user=self.user, name='Unused')
+        self.cheap = Recipe.objects.create(
+            user=self.user,
+            title='Cheap',
+            time_minutes=5,
+            price=2,
+        )
+        self.cheap.tags.add(self.vegan)
+        self.costly = Recipe.objects.create(
+            user=self.user,
+            title='Costly',
+            time_minutes=60,
+            price=30,
+        )
+        self.costly.tags.add(self.vegan, self.dinner)
+
+    def _counts(self, **params):
+        """ Return the recipe count of every listed tag name"""
+        res = self.client.get(TAGS_URLS, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return {
+            tag['name']: tag['recipe_count'] for tag in res.data['results']
+        }
+
+    def test_with_counts(self):
+        """ Test annotating the number of recipes of each tag"""
+        self.assertEqual(
+            self._counts(with_counts=1),
+            {'Vegan': 2, 'Dinner': 1, 'Unused': 0},
+        )
+
+    def test_assigned_only(self):
+        """ Test listing only the tags assigned to a recipe"""
+        res = self.client.get(TAGS_URLS, {'assigned_only': 1})
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Vegan', 'Dinner'],
+        )
+        self.assertNotIn('recipe_count', res.data['results'][0])
+
+    def test_counts_respect_recipe_filters(self):
+        """ Test drilling down the counts with the recipe filters"""
+        self.assertEqual(
+            self._counts(with_counts=1, assigned_only=1, max_price=10),
+            {'Vegan': 1},
+        )
+        self.assertEqual(
+            self._counts(with_counts=1, tags=self.dinner.id),
+            {'Vegan': 1, 'Dinner': 1, 'Unused': 0},
+        )
+
+    def test_counts_out_of_range_ids(self):
+        """ Test that drilling down with an oversized id is rejected"""
+        res = self.client.get(TAGS_URLS, {
+            'with_counts': 1,
+            'tags': '99999999999999999999',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_counts_single_grouped_query(self):
+        """ Test that the counts do not issue a query per tag"""
+        for index in range(10):
+            tag = Tag.objects.create(user=self.user, name=f'Extra {index}')
+            self.cheap.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(TAGS_URLS, {'with_counts': 1})
+
+        self.assertIn('GROUP BY', queries.captured_queries[-1]['sql'])
+        self.assertEqual(len(queries), 3)
+
+    def test_counts_refreshed_after_m2m_change(self):
+        """ Test that cached counts follow new recipe assignments"""
+        self.assertEqual(self._counts(with_counts=1)['Unused'], 0)
+        res = self.client.get(TAGS_URLS, {'with_counts': 1})
+        etag = res['ETag']
+
+        self.cheap.tags.add(self.unused)
+        res = self.client.get(
+            TAGS_URLS,
+            {'with_counts': 1},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._counts(with_counts=1)['Unused'], 1)
+
+    def test_invalid_flag(self):
+        """ Test that flags other than 0 and 1 are rejected"""
+        res = self.client.get(TAGS_URLS, {'with_counts': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
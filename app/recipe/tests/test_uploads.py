@@ -0,0 +1,195 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob
+from core.models import Recipe
+
+from recipe.uploads import HashingUploadHandler
+from recipe.uploads import UploadTooLarge
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_file(color='red', size=(10, 10)):
+    """ Return an uploadable JPEG image"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=color).save(buffer, format='JPEG')
+
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue())
+
+
+class UploadMixin:
+    """ Create a user with two recipes and upload images to them"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = self._recipe('First')
+        self.other = self._recipe('Second')
+
+    def tearDown(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def _recipe(self, title):
+        return Recipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=5.00,
+        )
+
+    def _upload(self, recipe, image):
+        with patch('recipe.views.schedule_image_processing') as schedule:
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image},
+                format='multipart',
+            )
+        recipe.refresh_from_db()
+        self.schedule = schedule
+
+        return res
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageUploadTests(UploadMixin, TestCase):
+    """ Test streaming and deduplicating image uploads"""
+
+    def test_duplicates_share_one_blob(self):
+        """ Test that identical images are stored once"""
+        content = image_file().read()
+        self._upload(self.recipe, SimpleUploadedFile('a.jpg', content))
+        self._upload(self.other, SimpleUploadedFile('b.jpg', content))
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(self.recipe.image.name, self.other.image.name)
+        self.assertEqual(
+            self.recipe.image.name,
+            f'uploads/recipe/{digest[:2]}/{digest}.jpg',
+        )
+        blob = ImageBlob.objects.get(name=self.recipe.image.name)
+        self.assertEqual(blob.references, 2)
+        self.assertEqual(blob.size, len(content))
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.recipe.image.path)),
+            [f'{digest}.jpg'],
+        )
+
+    def test_processed_duplicate_is_ready(self):
+        """ Test that a duplicate of a processed image is not reprocessed"""
+        content = image_file().read()
+        self._upload(self.recipe, SimpleUploadedFile('a.jpg', content))
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.IMAGE_READY,
+        )
+
+        res = self._upload(self.other, SimpleUploadedFile('b.jpg', content))
+
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.schedule.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1024)
+    def test_upload_too_large(self):
+        """ Test that oversized uploads are rejected"""
+        res = self._upload(self.recipe, image_file(size=(1000, 1000)))
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.assertFalse(self.recipe.image)
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_handler_rejects_large_body(self):
+        """ Test that a large request is rejected before reading its body"""
+        handler = HashingUploadHandler(max_size=10)
+
+        with self.assertRaises(UploadTooLarge):
+            handler.handle_raw_input(None, {}, 10 * 1024 * 1024, b'-')
+
+    def test_handler_stops_at_size_limit(self):
+        """ Test that streaming stops once the file exceeds the limit"""
+        handler = HashingUploadHandler(max_size=10)
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'12345', 0)
+
+        with self.assertRaises(UploadTooLarge):
+            handler.receive_data_chunk(b'678901', 5)
+
+    def test_handler_hashes_chunks(self):
+        """ Test that the streamed file carries the hash of its content"""
+        handler = HashingUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'abc', 0)
+        handler.receive_data_chunk(b'def', 3)
+        uploaded = handler.file_complete(6)
+
+        self.assertEqual(
+            uploaded.content_hash,
+            hashlib.sha256(b'abcdef').hexdigest(),
+        )
+        self.assertEqual(uploaded.read(), b'abcdef')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageReleaseTests(UploadMixin, TransactionTestCase):
+    """ Test deleting images once no recipe references them"""
+
+    def test_replaced_image_deleted(self):
+        """ Test that replacing an image deletes the unused one"""
+        self._upload(self.recipe, image_file('red'))
+        previous = self.recipe.image.name
+
+        self._upload(self.recipe, image_file('blue'))
+
+        self.assertNotEqual(self.recipe.image.name, previous)
+        self.assertFalse(default_storage.exists(previous))
+        self.assertFalse(ImageBlob.objects.filter(name=previous).exists())
+
+    def test_shared_image_kept(self):
+        """ Test that images used by another recipe are kept"""
+        self._upload(self.recipe, image_file('red'))
+        self._upload(self.other, image_file('red'))
+        shared = self.recipe.image.name
+
+        self._upload(self.recipe, image_file('blue'))
+
+        self.assertTrue(default_storage.exists(shared))
+        self.assertEqual(ImageBlob.objects.get(name=shared).references, 1)
+
+    def test_deleted_recipe_releases_image(self):
+        """ Test that deleting the last recipe deletes its image"""
+        self._upload(self.recipe, image_file('red'))
+        name = self.recipe.image.name
+
+        self.recipe.delete()
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
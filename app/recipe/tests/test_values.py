@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.models import Tag
+from core.models import Ingredient
+
+from recipe.cache import bump_data_version
+from recipe.serializers import IngredientSerializer
+from recipe.serializers import RecipeSerializer
+from recipe.serializers import TagSerializer
+from recipe.values import ValuesRepresentation
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class ValuesListTests(TestCase):
+    """ Test that list responses built from values() rows match the
+    serializers byte for byte"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dinner', 'Quick')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Rice', 'Lentils')
+        ]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Red lentil curry {i}' if i % 2 else f'Soup {i}',
+                time_minutes=5 * (i + 1),
+                price=f'{i * 1.5:.2f}',
+                link='https://example.com' if i % 3 else '',
+            )
+            recipe.tags.add(*tags[:i % 4])
+            recipe.ingredients.add(*ingredients[i % 3:])
+        Recipe.objects.filter(title='Soup 0').update(
+            image='uploads/recipe/ab/abcdef.jpg',
+            image_status=Recipe.IMAGE_READY,
+        )
+
+    def _get(self, url, params):
+        """ Return the body of a fresh, uncached response"""
+        bump_data_version(self.user.pk)
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200)
+
+        return res.content
+
+    def _assert_same_content(self, url, params):
+        with override_settings(RECIPE_VALUES_LIST=False):
+            expected = self._get(url, params)
+        with mock.patch.object(RecipeSerializer, 'to_representation') as \
+                recipe, \
+                mock.patch.object(TagSerializer, 'to_representation') as tag:
+            content = self._get(url, params)
+
+        self.assertEqual(content, expected)
+        recipe.assert_not_called()
+        tag.assert_not_called()
+
+    def test_recipe_list_matches_serializer(self):
+        """ Test the recipe list with every supported parameter"""
+        tag = Tag.objects.get(name='Vegan')
+        for params in (
+            {},
+            {'page_size': 5},
+            {'fields': 'id,title,time_minutes'},
+            {'fields': 'price,thumbnail,link'},
+            {'expand': 'tags,ingredients'},
+            {'fields': 'title', 'expand': 'ingredients'},
+            {'search': 'lentil'},
+            {'ordering': '-price', 'page_size': 4},
+            {'tags': f'{tag.id}', 'min_time': '20'},
+        ):
+            with self.subTest(params=params):
+                self._assert_same_content(RECIPE_URL, params)
+
+    def test_tag_and_ingredient_lists_match_serializer(self):
+        """ Test the tag and ingredient lists, with their facets"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            for params in ({}, {'with_counts': 1},
+                           {'assigned_only': 1, 'fields': 'name'}):
+                with self.subTest(url=url, params=params):
+                    self._assert_same_content(url, params)
+
+    def test_related_ids_in_one_query(self):
+        """ Test that the related ids of a page are loaded in bulk"""
+        bump_data_version(self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(queries), 4)
+
+
+class ValuesRepresentationTests(TestCase):
+    """ Test which serializers can be built from values() rows"""
+
+    def test_supported_serializers(self):
+        """ Test building the list serializers"""
+        self.assertIsNotNone(ValuesRepresentation.build(RecipeSerializer()))
+        self.assertIsNotNone(ValuesRepresentation.build(TagSerializer()))
+        self.assertEqual(
+            ValuesRepresentation.build(IngredientSerializer()).columns,
+            ['id', 'name'],
+        )
+
+    def test_unsupported_field(self):
+        """ Test that serializers with unknown fields are not built"""
+        class ImageSerializer(RecipeSerializer):
+            class Meta(RecipeSerializer.Meta):
+                fields = ('id', 'image')
+
+        self.assertIsNone(ValuesRepresentation.build(ImageSerializer()))
@@ -0,0 +1,139 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import ImageBlob
+from core.models import Recipe
+
+from recipe.images import delete_variants
+
+
+BLOB_DIRECTORY = 'uploads/recipe'
+# Room left for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'The uploaded file is too large.'
+    default_code = 'upload_too_large'
+
+
+def get_max_upload_size():
+    """ Return the largest accepted image, in bytes"""
+    return getattr(settings, 'RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """ Stream uploaded files to disk chunk by chunk, hashing them on the
+    way and aborting as soon as they exceed the size limit"""
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or get_max_upload_size()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        """ Reject the request before reading a body that is too large"""
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.file.close()
+            raise UploadTooLarge()
+        self.hash.update(raw_data)
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.content_hash = self.hash.hexdigest()
+
+        return uploaded
+
+
+def content_hash(uploaded):
+    """ Return the SHA-256 of an uploaded file"""
+    digest = getattr(uploaded, 'content_hash', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in uploaded.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+    return digest
+
+
+def blob_name(digest, extension):
+    """ Return the storage name of the content with the given hash"""
+    return os.path.join(BLOB_DIRECTORY, digest[:2], f'{digest}.{extension}')
+
+
+def store_image(uploaded):
+    """ Store a validated image once per content and take a reference
+    on it, returning its storage name"""
+    image_format = uploaded.image.format
+    name = blob_name(
+        content_hash(uploaded),
+        FORMAT_EXTENSIONS.get(image_format, image_format.lower()),
+    )
+    with transaction.atomic():
+        blob, _ = ImageBlob.objects.select_for_update().get_or_create(
+            name=name,
+            defaults={'size': uploaded.size},
+        )
+        if not default_storage.exists(name):
+            uploaded.seek(0)
+            default_storage.save(name, uploaded)
+        blob.references = F('references') + 1
+        blob.save(update_fields=['references'])
+
+    return name
+
+
+def release_image(name):
+    """ Drop a reference on a stored image, deleting it once unused"""
+    if not name:
+        return
+
+    ImageBlob.objects.filter(
+        name=name,
+        references__gt=0,
+    ).update(references=F('references') - 1)
+    transaction.on_commit(lambda: delete_unreferenced_image(name))
+
+
+def delete_unreferenced_image(name):
+    """ Delete an image and its variants when nothing references it.
+
+    The blob row is locked so a concurrent upload of the same content
+    either keeps the file or stores it again after the deletion.
+    """
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+        if blob is not None and blob.references > 0:
+            return
+        if blob is None and Recipe.objects.filter(image=name).exists():
+            return
+        default_storage.delete(name)
+        delete_variants(name)
+        if blob is not None:
+            blob.delete()
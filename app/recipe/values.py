@@ -0,0 +1,217 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.performance import measure
+
+
+# Fields whose representation is the database value itself
+IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField)
+# Fields converting the database value with their to_representation()
+CONVERTED_FIELDS = (
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+)
+
+COLUMN = 'column'
+METHOD = 'method'
+RELATED = 'related'
+
+
+class ValuesRepresentation:
+    """ Build the representation of a model serializer from values() rows
+    instead of model instances, bypassing the per field machinery of DRF.
+
+    Supported fields are plain model fields (and annotations), primary key
+    lists and nested serializers of many to many relations, and method
+    fields whose serializer defines get_<name>_from_values(row). build()
+    returns None for any other serializer so callers fall back to it.
+    """
+
+    def __init__(self, model, steps, relations):
+        self.model = model
+        self.steps = steps
+        self.relations = relations
+        self.columns = [arg[0] for _, kind, arg in steps if kind == COLUMN]
+
+    @classmethod
+    def build(cls, serializer, annotations=()):
+        """ Return the representation of the serializer fields, None when
+        one of them is not supported"""
+        model = serializer.Meta.model
+        steps = []
+        relations = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                method = getattr(serializer, f'get_{name}_from_values', None)
+                if method is None:
+                    return None
+                steps.append((name, METHOD, method))
+            elif isinstance(field, (serializers.ManyRelatedField,
+                                    serializers.ListSerializer)):
+                relation = cls._build_relation(model, field)
+                if relation is None:
+                    return None
+                relations[field.source] = relation
+                steps.append((name, RELATED, field.source))
+            else:
+                column = cls._column(model, field, annotations)
+                if column is None:
+                    return None
+                steps.append((name, COLUMN, column))
+
+        return cls(model, steps, relations)
+
+    @staticmethod
+    def _column(model, field, annotations):
+        """ Return the column read by a plain field and its converter,
+        None for unsupported fields"""
+        if not isinstance(field, IDENTITY_FIELDS + CONVERTED_FIELDS):
+            return None
+        if len(field.source_attrs) != 1:
+            return None
+
+        source = field.source_attrs[0]
+        if source not in annotations:
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.is_relation:
+                return None
+        if isinstance(field, IDENTITY_FIELDS):
+            return source, None
+
+        return source, field.to_representation
+
+    @classmethod
+    def _build_relation(cls, model, field):
+        """ Return the related model, query name and nested representation
+        of a many to many field, None when it is not supported"""
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not isinstance(model_field, models.ManyToManyField):
+            return None
+
+        if isinstance(field, serializers.ManyRelatedField):
+            child = field.child_relation
+            if not isinstance(child, serializers.PrimaryKeyRelatedField) or \
+                    child.pk_field is not None:
+                return None
+            nested = None
+        else:
+            nested = cls.build(field.child)
+            if nested is None or \
+                    any(kind != COLUMN for _, kind, _ in nested.steps):
+                return None
+
+        return (
+            model_field.related_model,
+            model_field.related_query_name(),
+            nested,
+        )
+
+    def _related_map(self, relation, ids):
+        """ Return the related ids, or nested representations, by row id.
+
+        The query joins the through table like prefetch_related() so the
+        related objects come in the same order.
+        """
+        related_model, query_name, nested = relation
+        columns = nested.columns if nested is not None else ['pk']
+        rows = related_model.objects.filter(**{
+            f'{query_name}__in': ids,
+        }).values_list(query_name, *columns)
+
+        grouped = defaultdict(list)
+        for owner, *values in rows:
+            if nested is None:
+                grouped[owner].append(values[0])
+            else:
+                grouped[owner].append(
+                    nested._represent(dict(zip(columns, values)), {}),
+                )
+
+        return grouped
+
+    def _represent(self, row, related):
+        item = {}
+        for name, kind, arg in self.steps:
+            if kind == COLUMN:
+                column, convert = arg
+                value = row[column]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            elif kind == METHOD:
+                item[name] = arg(row)
+            else:
+                item[name] = related[arg].get(row['id']) or []
+
+        return item
+
+    def to_representation(self, rows):
+        """ Return the representation of a list of values() rows"""
+        related = {}
+        if self.relations and rows:
+            ids = [row['id'] for row in rows]
+            for source, relation in self.relations.items():
+                related[source] = self._related_map(relation, ids)
+
+        return [self._represent(row, related) for row in rows]
+
+
+class ValuesListMixin:
+    """ View mixin answering list requests from values() rows when the
+    serializer allows it, see ValuesRepresentation.
+
+    Views need SparseFieldsetMixin to tell the columns to load. Setting
+    RECIPE_VALUES_LIST to False always uses the serializers.
+    """
+
+    def get_values_queryset(self, queryset, fields):
+        """ Return the values() queryset loading the given fields"""
+        columns = self.get_fieldset_columns(fields)
+        annotations = queryset.query.annotations
+        for name in list(fields) + [o.lstrip('-') for o in
+                                    self.get_ordering()]:
+            if name in annotations and name not in columns:
+                columns.append(name)
+
+        return queryset.prefetch_related(None).values(*columns)
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'RECIPE_VALUES_LIST', True):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        representation = ValuesRepresentation.build(
+            serializer,
+            queryset.query.annotations,
+        )
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_values_queryset(queryset, serializer.fields)
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        with measure(request, 'serialize'):
+            data = representation.to_representation(rows)
+        if page is None:
+            return Response(data)
+
+        return self.get_paginated_response(data)
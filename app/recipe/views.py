@@ -1,32 +1,223 @@
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Max
+from django.db.models import Prefetch
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Greatest
+from django.http import StreamingHttpResponse
+
 from rest_framework import viewsets
 from rest_framework import mixins
+from rest_framework import serializers
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Tag
 from core.models import Ingredient
 from core.models import Recipe
 
 from recipe.serializers import TagSerializer
+from recipe.serializers import TagCountSerializer
 from recipe.serializers import IngredientSerializer
+from recipe.serializers import IngredientCountSerializer
 from recipe.serializers import RecipeSerializer
 from recipe.serializers import RecipeDetailSerializer
 from recipe.serializers import RecipeImageSerializer
+from recipe.pagination import KeysetPagination
+from recipe.export import EXPORT_FORMATS
+from recipe.bulk import import_recipes
+from recipe.cache import CachedResponseMixin
+from recipe.cache import bump_data_version
+from recipe.conditional import ConditionalGetMixin
+from recipe.fieldsets import SparseFieldsetMixin
+from recipe.search import search_recipes
+from recipe.images import schedule_image_processing
+from recipe.uploads import HashingUploadHandler
+from recipe.values import ValuesListMixin
+
+
+RECIPE_LIST_FIELDS = (
+    'id',
+    'title',
+    'time_minutes',
+    'price',
+    'link',
+    'image',
+    'image_status',
+)
+# Bounded like the model columns, so values the database cannot compare
+# are rejected
+RECIPE_PRICE_FIELD = serializers.DecimalField(max_digits=5, decimal_places=2)
+RECIPE_TIME_FIELD = serializers.IntegerField(min_value=0, max_value=2**31 - 1)
+RECIPE_RANGE_FILTERS = (
+    ('min_price', 'price__gte', RECIPE_PRICE_FIELD),
+    ('max_price', 'price__lte', RECIPE_PRICE_FIELD),
+    ('min_time', 'time_minutes__gte', RECIPE_TIME_FIELD),
+    ('max_time', 'time_minutes__lte', RECIPE_TIME_FIELD),
+)
+RECIPE_ORDERING_FIELDS = ('id', 'price', 'time_minutes')
+# Ids past the largest primary key the database stores overflow
+MAX_PK = 2 ** 63
+
+
+class RecipeFilterMixin:
+    """ Filter recipes by tags, ingredients, ranges and search text"""
+
+    def _params_to_ints(self, qs):
+        """ converts a list of sting IDs to a list of integers"""
+        return [int(str_id) for str_id in qs.split(',')]
+
+    def _ids_param(self, name):
+        """ Return the list of ids of a query parameter, None when it is
+        missing"""
+        param = self.request.query_params.get(name)
+        if not param:
+            return None
+        try:
+            ids = self._params_to_ints(param)
+        except ValueError:
+            raise ValidationError({name: ['Expected a list of ids']})
+        if not all(0 < pk < MAX_PK for pk in ids):
+            raise ValidationError({name: [
+                f'Ids must be between 1 and {MAX_PK - 1}'
+            ]})
 
+        return ids
 
-class BaseRecipeViewSet(viewsets.GenericViewSet,
+    def _number_param(self, name, field):
+        """ Return a numeric query parameter validated by the serializer
+        field, None when it is missing"""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return field.run_validation(value)
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    def _related_filter(self, field, ids, match_all):
+        """ Return a semi-join condition on the tags or ingredients
+        through table, for recipes having any (or all) of the ids"""
+        through = getattr(Recipe, field).through
+        related = Recipe._meta.get_field(field).related_model
+        column = f'{related._meta.model_name}_id'
+        rows = through.objects.filter(**{f'{column}__in': ids})
+        if match_all:
+            rows = rows.values('recipe_id').annotate(
+                matched=Count(column),
+            ).filter(matched=len(set(ids)))
+
+        return Q(id__in=rows.values('recipe_id'))
+
+    def filter_recipes(self, queryset):
+        """ Apply the recipe filters of the query parameters"""
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': ['Match must be any or all']})
+        for field in ('tags', 'ingredients'):
+            ids = self._ids_param(field)
+            if ids is None:
+                continue
+            queryset = queryset.filter(
+                self._related_filter(field, ids, match == 'all'),
+            )
+        for name, lookup, field in RECIPE_RANGE_FILTERS:
+            value = self._number_param(name, field)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: value})
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = search_recipes(queryset, search)
+
+        return queryset
+
+
+class BaseRecipeViewSet(RecipeFilterMixin,
+                        SparseFieldsetMixin,
+                        CachedResponseMixin,
+                        ConditionalGetMixin,
+                        ValuesListMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin):
     """Base viewset to manage the models"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-name', '-id')
+    count_serializer_class = None
+
+    def _flag_param(self, name):
+        """ Return a 0/1 query parameter as a boolean"""
+        value = self.request.query_params.get(name, '0')
+        if value not in ('0', '1'):
+            raise ValidationError({name: ['Expected 0 or 1']})
+
+        return value == '1'
+
+    def _facet_mode(self):
+        """ Tell whether the list is restricted to assigned objects or
+        counts their recipes"""
+        return self.action == 'list' and (
+            self._flag_param('assigned_only') or
+            self._flag_param('with_counts')
+        )
+
+    def get_facet_recipes(self):
+        """ Return the recipes of the user matching the recipe filters"""
+        return self.filter_recipes(
+            Recipe.objects.filter(user=self.request.user),
+        )
+
+    def get_ordering(self):
+        """ Return the ordering of the list"""
+        return self.ordering
 
     def get_queryset(self):
-        """ Return objects for the current user only"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        """ Return objects for the current user only, optionally assigned
+        to (and counting) the recipes matching the recipe filters"""
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._facet_mode():
+            recipe_ids = self.get_facet_recipes().values('id')
+            if self._flag_param('assigned_only'):
+                field = f'{self.queryset.model._meta.model_name}s'
+                column = f'{self.queryset.model._meta.model_name}_id'
+                rows = getattr(Recipe, field).through.objects.filter(
+                    recipe_id__in=recipe_ids,
+                )
+                queryset = queryset.filter(id__in=rows.values(column))
+            if self._flag_param('with_counts'):
+                queryset = queryset.annotate(recipe_count=Count(
+                    'recipe',
+                    filter=Q(recipe__in=recipe_ids),
+                ))
+        fields, _ = self.get_fieldset()
+        if fields is not None:
+            queryset = queryset.only(*self.get_fieldset_columns(fields))
+
+        return queryset.order_by(*self.get_ordering())
+
+    def get_validator_querysets(self):
+        """ Counts change with the recipes, include them in the ETag"""
+        if not self._facet_mode():
+            return super().get_validator_querysets()
+
+        return [
+            self.queryset.filter(user=self.request.user),
+            self.get_facet_recipes(),
+        ]
+
+    def get_serializer_class(self):
+        """ Add the recipe count to the list when requested"""
+        if self._facet_mode() and self._flag_param('with_counts'):
+            return self.count_serializer_class
+
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """ Add user when creating the object"""
@@ -37,42 +228,110 @@ class TagViewSet(BaseRecipeViewSet):
     """ Manage Tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    count_serializer_class = TagCountSerializer
 
 
 class IngredientViewSet(BaseRecipeViewSet):
     """ Manage Ingredient in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    count_serializer_class = IngredientCountSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RecipeFilterMixin,
+                    SparseFieldsetMixin,
+                    CachedResponseMixin,
+                    ConditionalGetMixin,
+                    ValuesListMixin,
+                    viewsets.ModelViewSet):
     """manage Recipes in the database"""
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-
-    def _params_to_ints(self, qs):
-        """ converts a list of sting IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    fieldset_sources = {
+        'thumbnail': ('image', 'image_status'),
+        'images': ('image', 'image_status'),
+    }
+    import_max_items = 10000
+    batch_max_ids = 100
 
     def get_queryset(self):
         """ Return objects for the current user only"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
-        self.queryset = queryset
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.filter_recipes(
+            self.queryset.filter(user=self.request.user),
+        )
+        queryset = queryset.order_by(*self.get_ordering())
+
+        return self._optimize_queryset(queryset)
+
+    def get_ordering(self):
+        """ Return the requested ordering, with the id breaking ties, or
+        the best matches first when searching"""
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            field = ordering.lstrip('-')
+            if field not in RECIPE_ORDERING_FIELDS:
+                choices = ', '.join(RECIPE_ORDERING_FIELDS)
+                raise ValidationError({'ordering': [
+                    f'Ordering must be one of {choices}'
+                ]})
+            prefix = '-' if ordering.startswith('-') else ''
+            return tuple(
+                f'{prefix}{name}' for name in dict.fromkeys((field, 'id'))
+            )
+        if self.request.query_params.get('search'):
+            return ('-search_rank',)
+
+        return self.ordering
+
+    def _optimize_queryset(self, queryset):
+        """ Pick the prefetch/only() plan matching the action serializer
+        and the requested fields"""
+        if self.action not in ('list', 'retrieve', 'batch'):
+            return queryset
+
+        fields, expand = self.get_fieldset()
+        if fields is not None:
+            queryset = queryset.only(*self.get_fieldset_columns(fields))
+        elif self.action == 'list':
+            queryset = queryset.only(*RECIPE_LIST_FIELDS)
+        for name, model in (('tags', Tag), ('ingredients', Ingredient)):
+            if fields is not None and name not in fields:
+                continue
+            nested = self.action != 'list' or name in expand
+            columns = ('id', 'name') if nested else ('id',)
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=model.objects.only(*columns)),
+            )
+
+        return queryset
+
+    def get_list_last_modified_fields(self):
+        """ Include the expanded tags and ingredients in the list
+        validators"""
+        _, expand = self.get_fieldset()
+
+        return ('updated_at',) + tuple(
+            f'{name}__updated_at' for name in expand
+        )
+
+    def get_last_modified_expression(self):
+        """ Include nested tags and ingredients in the detail timestamp"""
+        if self.action == 'retrieve':
+            return Greatest(
+                F('updated_at'),
+                Coalesce(Max('tags__updated_at'), F('updated_at')),
+                Coalesce(Max('ingredients__updated_at'), F('updated_at')),
+            )
+
+        return super().get_last_modified_expression()
 
     def get_serializer_class(self):
         """Return appropiate serializer class"""
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'batch'):
             return RecipeDetailSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
@@ -85,7 +344,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """upload an image to a recipe"""
+        """upload an image to a recipe, its variants are built in the
+        background"""
+        request._request.upload_handlers = [
+            HashingUploadHandler(request._request),
+        ]
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
@@ -94,6 +357,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
+            if recipe.image_status == Recipe.IMAGE_PENDING:
+                schedule_image_processing(recipe)
             return Response(
                 serializer.data,
                 status.HTTP_200_OK,
@@ -102,3 +367,88 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST,
         )
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream every recipe of the user as NDJSON or CSV"""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_FORMATS:
+            return Response(
+                {'type': f'Unsupported export type "{export_type}"'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stream, content_type = EXPORT_FORMATS[export_type]
+        response = StreamingHttpResponse(
+            stream(self.get_queryset()),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_type}"'
+        )
+
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='batch')
+    def batch(self, request):
+        """Return the detail of many recipes of the user, by id"""
+        return self._cached_response(self._batch, request)
+
+    def _batch(self, request):
+        ids = self._ids_param('ids')
+        if ids is None:
+            raise ValidationError({'ids': ['This parameter is required.']})
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.batch_max_ids:
+            raise ValidationError({'ids': [
+                f'At most {self.batch_max_ids} recipes can be requested '
+                f'at once'
+            ]})
+
+        recipes = self._optimize_queryset(self.queryset.filter(
+            user=request.user,
+            id__in=ids,
+        ))
+        by_id = {recipe.id: recipe for recipe in recipes}
+        serializer = self.get_serializer(
+            [by_id[pk] for pk in ids if pk in by_id],
+            many=True,
+        )
+
+        return Response({
+            'results': serializer.data,
+            'errors': [
+                {'id': pk, 'detail': 'Not found.'}
+                for pk in ids if pk not in by_id
+            ],
+        })
+
+    @action(methods=['POST'], detail=False, url_path='import')
+    def bulk_import(self, request):
+        """Create many recipes in a single request"""
+        data = request.data
+        if isinstance(data, dict):
+            data = data.get('recipes')
+        if not isinstance(data, list):
+            return Response(
+                {'recipes': 'Expected a list of recipes'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(data) > self.import_max_items:
+            return Response(
+                {'recipes': f'At most {self.import_max_items} recipes '
+                            f'can be imported at once'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created, errors = import_recipes(request.user, data)
+        if created:
+            bump_data_version(request.user.pk)
+
+        return Response(
+            {'created': created, 'errors': errors},
+            status=(
+                status.HTTP_201_CREATED if created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
@@ -4,8 +4,11 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from core.serializers import TimedRepresentationMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedRepresentationMixin,
+                     serializers.ModelSerializer):
     """ Serializer for the user object"""
 
     class Meta:
@@ -1,10 +1,15 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.authentication import invalidate_tokens
+from core.testing import QueryBudgetMixin
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -15,7 +20,27 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
-class PublicUserApiTests(TestCase):
+def create_users(count):
+    """ Create other users with their tokens, the rows the user endpoints
+    look up, to check they are not scanned"""
+    model = get_user_model()
+    start = model.objects.count()
+    # Hashing once keeps growing the table cheap
+    password = make_password('test1234')
+    users = model.objects.bulk_create([
+        model(email=f'other{i}@recipe.com', password=password)
+        for i in range(start, start + count)
+    ])
+    if not all(user.pk for user in users):
+        users = model.objects.filter(
+            email__in=[user.email for user in users],
+        )
+    Token.objects.bulk_create([
+        Token(key=Token().generate_key(), user=user) for user in users
+    ])
+
+
+class PublicUserApiTests(QueryBudgetMixin, TestCase):
     """ Test the users API (public)"""
 
     def setUp(self):
@@ -119,6 +144,33 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_user_query_budget(self):
+        """ Test the sign up budget with 1 and 100 existing users"""
+        emails = iter(['first@recipe.com', 'second@recipe.com'])
+
+        self.assertQueryBudgetAtSizes(
+            2,
+            create_users,
+            lambda: self.client.post(CREATE_USER_URL, {
+                'email': next(emails),
+                'password': 'test1234',
+                'name': 'Test',
+            }),
+        )
+
+    def test_create_token_query_budget(self):
+        """ Test the token budget with 1 and 100 users holding tokens"""
+        create_user(email='test@recipe.com', password='test1234')
+
+        self.assertQueryBudgetAtSizes(
+            5,
+            create_users,
+            lambda: self.client.post(TOKEN_URL, {
+                'email': 'test@recipe.com',
+                'password': 'test1234',
+            }),
+        )
+
     def test_retrieve_user_unauthorize(self):
         """ Authtentication is required for users"""
         res = self.client.get(ME_URL)
@@ -126,7 +178,7 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateUserApiTests(TestCase):
+class PrivateUserApiTests(QueryBudgetMixin, TestCase):
     """ Test API request that require authentication """
 
     def setUp(self):
@@ -167,3 +219,35 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def _token_client(self):
+        """ Return a client sending a token, looked up on every request"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        def send(method, *args):
+            invalidate_tokens(token.key)
+            return getattr(client, method)(*args)
+
+        return send
+
+    def test_retrieve_profile_query_budget(self):
+        """ Test the profile budget with 1 and 100 other tokens"""
+        send = self._token_client()
+
+        self.assertQueryBudgetAtSizes(
+            1,
+            create_users,
+            lambda: send('get', ME_URL),
+        )
+
+    def test_update_profile_query_budget(self):
+        """ Test the profile update budget with 1 and 100 other tokens"""
+        send = self._token_client()
+
+        self.assertQueryBudgetAtSizes(
+            3,
+            create_users,
+            lambda: send('patch', ME_URL, {'name': 'New name'}),
+        )